@@ -1,11 +1,72 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     database_url: str = "sqlite:///./smart_student_hub.db"
     mongo_url: str = "mongodb://localhost:27017"
+    # How long a MongoDB connection attempt may take, and how often the app
+    # retries in the background while serving from the fallback store
+    mongo_connect_timeout_ms: int = 2000
+    mongo_retry_seconds: float = 30.0
     secret_key: str = "your-secret-key-here-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # Optional read replica for read-only routes; reads use the primary when unset
+    database_read_url: Optional[str] = None
+    # SQL connection pool (pool_recycle in seconds, -1 disables recycling)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # SQLite tuning applied to every new connection
+    sqlite_wal: bool = True
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_bytes: int = 256 * 1024 * 1024
+    # Authenticated-user cache; entries are invalidated locally on profile
+    # changes and otherwise expire after the TTL (0 disables the cache)
+    principal_cache_ttl_seconds: int = 60
+    principal_cache_max_entries: int = 10000
+    # Password hashing: pbkdf2_sha256 rounds (stored hashes with a different
+    # count are upgraded on login) and the process pool that computes them
+    password_hash_rounds: int = 29000
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 64
+    # Use async drivers (async SQLAlchemy engine, Motor) instead of running
+    # the sync drivers on the threadpool
+    async_io: bool = False
+    # Store used for activities when MongoDB is unreachable: "file" or "memory"
+    fallback_store: str = "file"
+    fallback_store_dir: str = "data"
+    fallback_store_fsync: bool = True
+    fallback_store_cache_size: int = 1024
+
+    # Proof uploads: stored by content hash under upload_dir
+    upload_dir: str = "uploads"
+    max_upload_bytes: int = 20 * 1024 * 1024
+    upload_chunk_bytes: int = 1024 * 1024
+    # Thumbnail/preview generation for proofs (0 workers disables it)
+    preview_workers: int = 1
+    preview_max_pending: int = 256
+    preview_size: int = 320
+    # Faculty push channel (server-sent events): per-subscriber queue bound
+    # and keep-alive interval
+    event_queue_size: int = 100
+    event_heartbeat_seconds: float = 15.0
+    # Request metrics on /metrics (Prometheus text format); server_timing
+    # also adds a Server-Timing header with the SQL/Mongo breakdown
+    metrics_enabled: bool = True
+    server_timing: bool = False
+    # Sampling profiler (app/profiling.py): profile every request, or only
+    # those sent by admins with an X-Profile header; keep the N slowest
+    profiling_enabled: bool = False
+    profile_interval_ms: float = 5.0
+    profile_keep: int = 20
+    # Cold-start budget for importing the app and running its startup,
+    # checked by startup_time.py; a slower lifespan startup alone is also
+    # logged as a warning
+    startup_budget_ms: int = 2000
 
     class Config:
         env_file = ".env"
@@ -1,20 +1,102 @@
-from sqlalchemy import create_engine
+from contextlib import asynccontextmanager
+
+from sqlalchemy import create_engine, event
 
 from sqlalchemy.ext.declarative import declarative_base
 
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy import text
 
+from starlette.concurrency import run_in_threadpool
+
 from .config import settings
 
 SQLALCHEMY_DATABASE_URL = settings.database_url
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+def is_sqlite(url: str) -> bool:
+    return url.split(":", 1)[0].split("+", 1)[0] == "sqlite"
+
+def engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": settings.db_pool_pre_ping, "pool_recycle": settings.db_pool_recycle}
+    # In-memory SQLite keeps a single connection per thread; pool sizing
+    # doesn't apply there
+    if not (is_sqlite(url) and ":memory:" in url):
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+        )
+    return options
+
+def _tune_sqlite(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the single writer, and busy_timeout
+    # makes concurrent commits wait for the lock instead of failing with
+    # "database is locked". synchronous=NORMAL is durable under WAL except
+    # for the last transactions on power loss.
+    cursor = dbapi_connection.cursor()
+    if settings.sqlite_wal:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_bytes)}")
+    cursor.close()
+
+def make_engine(url: str):
+    new_engine = create_engine(url, **engine_options(url))
+    if is_sqlite(url):
+        event.listen(new_engine, "connect", _tune_sqlite)
+    return new_engine
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read-only routes may be served by a replica. Without one they share the
+# primary engine (WAL already lets SQLite readers run beside the writer).
+read_engine = make_engine(settings.database_read_url) if settings.database_read_url else engine
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
+# Async drivers for the URLs we support; used when settings.async_io is on
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def async_database_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    return f"{ASYNC_DRIVERS.get(dialect, scheme)}://{rest}"
+
+async_engine = None
+
+AsyncSessionLocal = None
+
+async_read_engine = None
+
+AsyncReadSessionLocal = None
+
+if settings.async_io:
+
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    def make_async_engine(url: str):
+        new_engine = create_async_engine(async_database_url(url), **engine_options(url))
+        if is_sqlite(url):
+            event.listen(new_engine.sync_engine, "connect", _tune_sqlite)
+        return new_engine
+
+    async_engine = make_async_engine(SQLALCHEMY_DATABASE_URL)
+
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async_read_engine = make_async_engine(settings.database_read_url) if settings.database_read_url else async_engine
+
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
 
     db = SessionLocal()
@@ -25,4 +107,80 @@ def get_db():
 
     finally:
 
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db():
+
+    db = ReadSessionLocal()
+
+    try:
+
+        yield db
+
+    finally:
+
+        db.close()
+
+async def get_async_db():
+
+    async with AsyncSessionLocal() as db:
+
+        yield db
+
+async def get_async_read_db():
+
+    async with AsyncReadSessionLocal() as db:
+
+        yield db
+
+if not settings.database_read_url:
+    # Without a replica, read routes reuse the request's primary session
+    # (FastAPI resolves a dependency once per request). Two sessions from
+    # one pool per request can deadlock it under load: every request holds
+    # one connection while waiting for its second.
+    get_read_db = get_db
+    get_async_read_db = get_async_db
+
+# Session dependency for async routes: an AsyncSession on the async engine
+# when async_io is enabled, otherwise a regular Session whose calls
+# run_db pushes onto the threadpool.
+get_session = get_async_db if settings.async_io else get_db
+
+# Same, for read-only routes (replica when configured)
+get_read_session = get_async_read_db if settings.async_io else get_read_db
+
+@asynccontextmanager
+async def open_session():
+    """A session closed as soon as the block exits.
+
+    Dependency sessions live until the response is sent; streaming routes
+    use this instead so they don't hold a pooled connection for the whole
+    download or event stream.
+    """
+
+    if settings.async_io:
+
+        async with AsyncSessionLocal() as db:
+
+            yield db
+
+        return
+
+    db = SessionLocal()
+
+    try:
+
+        yield db
+
+    finally:
+
+        db.close()
+
+async def run_db(db, fn, *args, **kwargs):
+    """Run ``fn(session, *args, **kwargs)`` without blocking the event loop."""
+
+    if isinstance(db, Session):
+
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+
+    return await db.run_sync(fn, *args, **kwargs)
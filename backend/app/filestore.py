@@ -0,0 +1,240 @@
+"""File-backed fallback store for activities.
+
+Same collection API and query engine as ``mockdb.MockCollection``, but
+documents are persisted to an append-only log so a node running without
+MongoDB does not lose writes on restart.
+
+Log format: one record per line, ``<crc32 hex>\\t<extended JSON>\\n`` where
+the JSON is ``{"op": "put", "doc": {...}}`` or ``{"op": "del", "_id": ...}``.
+On startup the log is replayed into an in-memory keydir (``_id`` -> offset
+and length) plus the secondary indexes; document bodies are read back from
+disk on demand through a bounded LRU cache. A torn record at the tail (a
+crash mid-write) fails its checksum and is truncated away; a bad record
+followed by valid ones is corruption and refuses to open. When more than
+half of the log is dead records it is compacted into a fresh file that
+atomically replaces the old one. Compaction only moves records, so it
+leaves the in-memory indexes alone and is safe in the middle of a write.
+
+The keydir is private to the process that replayed the log, so only one
+process may have a store open: an exclusive ``flock`` on ``<name>.lock``
+is held until ``close()``, and a second opener fails with
+``StoreLockedError``.
+"""
+
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single process assumed
+    fcntl = None
+
+from bson import json_util
+from bson.json_util import RELAXED_JSON_OPTIONS
+
+from .mockdb import MockCollection
+
+# Don't bother compacting logs smaller than this
+MIN_COMPACT_BYTES = 1024 * 1024
+
+def _encode(record):
+    payload = json_util.dumps(record, json_options=RELAXED_JSON_OPTIONS).encode()
+    return b"%08x\t%s\n" % (zlib.crc32(payload), payload)
+
+def _decode(line):
+    if not line.endswith(b"\n") or len(line) < 10 or line[8:9] != b"\t":
+        return None
+    payload = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload):
+            return None
+        return json_util.loads(payload)
+    except ValueError:
+        return None
+
+class CorruptLogError(ValueError):
+    """A record in the middle of the log failed its checksum."""
+
+class StoreLockedError(RuntimeError):
+    """Another process has the store open."""
+
+class FileCollection(MockCollection):
+    """Append-only-log collection with a bounded document cache."""
+
+    def __init__(self, name, directory, fsync=True, cache_size=1024):
+        super().__init__(name)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{name}.log")
+        self.fsync = fsync
+        self.cache_size = cache_size
+        self._keydir = {}
+        self._cache = OrderedDict()
+        self._dead_bytes = 0
+        self._file_lock = threading.Lock()
+        self._lock_file = self._acquire(os.path.join(directory, f"{name}.lock"))
+        try:
+            self._open()
+        except BaseException:
+            os.close(self._lock_file)
+            raise
+
+    # -- log management ----------------------------------------------------
+
+    @staticmethod
+    def _acquire(path):
+        # A separate lock file, since compaction replaces the log's inode
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is None:
+            return fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            raise StoreLockedError(
+                f"{path} is held by another process; stop it (or use MongoDB) before opening this store"
+            )
+        return fd
+
+    def _open(self):
+        self._keydir.clear()
+        self._cache.clear()
+        for index in self.indexes.values():
+            index.clear()
+        if self.text_index is not None:
+            self.text_index.clear()
+        self._dead_bytes = 0
+        self._writer = open(self.path, "ab")
+        self._reader = os.open(self.path, os.O_RDONLY)
+        if self._replay():
+            self._writer.seek(0, os.SEEK_END)
+
+    def _replay(self):
+        offset = 0
+        with open(self.path, "rb") as log:
+            for line in log:
+                record = _decode(line)
+                if record is None:
+                    if log.read(1):
+                        raise CorruptLogError(f"{self.path}: bad record at byte {offset}")
+                    break
+                if record["op"] == "put":
+                    doc = record["doc"]
+                    self._forget(doc["_id"])
+                    self._keydir[doc["_id"]] = (offset, len(line))
+                    self._index_add(doc["_id"], doc)
+                else:
+                    self._forget(record["_id"])
+                    self._dead_bytes += len(line)
+                offset += len(line)
+        if offset != os.path.getsize(self.path):
+            # Drop a partially written record left by a crash
+            os.truncate(self.path, offset)
+            return True
+        return False
+
+    def _forget(self, key):
+        location = self._keydir.pop(key, None)
+        if location is not None:
+            self._index_remove(key, self._read(location))
+            self._dead_bytes += location[1]
+
+    def _append(self, record):
+        data = _encode(record)
+        with self._file_lock:
+            offset = self._writer.tell()
+            self._writer.write(data)
+            self._writer.flush()
+            if self.fsync:
+                os.fsync(self._writer.fileno())
+        return offset, len(data)
+
+    def _read(self, location):
+        offset, length = location
+        record = _decode(os.pread(self._reader, length, offset))
+        return record["doc"]
+
+    def _remember(self, key, doc):
+        self._cache[key] = doc
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _maybe_compact(self):
+        live_bytes = self._writer.tell() - self._dead_bytes
+        if self._dead_bytes > MIN_COMPACT_BYTES and self._dead_bytes > live_bytes:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the log with only live documents and swap it in atomically."""
+        with self._lock:
+            tmp_path = self.path + ".compact"
+            locations = {}
+            offset = 0
+            with open(tmp_path, "wb") as out:
+                for key in list(self._keydir):
+                    data = _encode({"op": "put", "doc": self._load(key)})
+                    out.write(data)
+                    locations[key] = (offset, len(data))
+                    offset += len(data)
+                out.flush()
+                os.fsync(out.fileno())
+            self._close_log()
+            os.replace(tmp_path, self.path)
+            directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+            # Same documents at new offsets: the indexes stay as they are
+            self._keydir = locations
+            self._dead_bytes = 0
+            self._writer = open(self.path, "ab")
+            self._reader = os.open(self.path, os.O_RDONLY)
+
+    def _close_log(self):
+        self._writer.close()
+        os.close(self._reader)
+
+    def close(self):
+        if self._writer.closed:
+            return
+        self._close_log()
+        # Closing the descriptor releases the flock
+        os.close(self._lock_file)
+
+    # -- storage hooks -----------------------------------------------------
+
+    def _keys(self):
+        return list(self._keydir.keys())
+
+    def _load(self, key):
+        doc = self._cache.get(key)
+        if doc is not None:
+            self._cache.move_to_end(key)
+            return doc
+        location = self._keydir.get(key)
+        if location is None:
+            return None
+        doc = self._read(location)
+        self._remember(key, doc)
+        return doc
+
+    def _store(self, key, doc):
+        location = self._append({"op": "put", "doc": doc})
+        previous = self._keydir.get(key)
+        if previous is not None:
+            self._dead_bytes += previous[1]
+        self._keydir[key] = location
+        self._remember(key, doc)
+        self._maybe_compact()
+
+    def _discard(self, key):
+        location = self._keydir.pop(key, None)
+        if location is None:
+            return
+        tombstone = self._append({"op": "del", "_id": key})
+        self._dead_bytes += location[1] + tombstone[1]
+        self._cache.pop(key, None)
+        self._maybe_compact()
@@ -0,0 +1,144 @@
+"""Index declarations for both stores, startup provisioning and EXPLAIN checks.
+
+SQL indexes are declared on the models (``__table_args__``); ``create_all``
+only builds them for new tables, so ``provision_indexes`` also creates any
+that are missing on existing databases. Mongo indexes are declared here.
+Both steps are idempotent.
+"""
+
+import logging
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from .database import Base, engine
+from .models.skill import Skill, SkillPosting
+from .models.user import AcademicRecord, User
+
+logger = logging.getLogger(__name__)
+
+MONGO_INDEXES = {
+    "activities": [
+        # Faculty pending queue: status + denormalized department/year, by age
+        {"keys": [("status", 1), ("department", 1), ("year", 1), ("created_at", 1)],
+         "name": "status_department_year_created_at"},
+        # A student's own activity list, newest first
+        {"keys": [("user_id", 1), ("created_at", -1)], "name": "user_id_created_at"},
+        # Activities by proof file, to attach thumbnails as previews finish
+        {"keys": [("proof_url", 1)], "name": "proof_url"},
+        # Full-text search over titles and descriptions, titles weighted up
+        {"keys": [("title", "text"), ("description", "text")], "name": "title_description_text",
+         "weights": {"title": 3, "description": 1}},
+    ],
+}
+
+def ensure_sql_indexes(bind=engine):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=bind, checkfirst=True)
+            except IntegrityError as exc:
+                # A unique index over rows that already violate it; the
+                # matching migrate_*.py script dedupes them
+                logger.error("Could not create unique index %s: %s", index.name, exc.orig)
+
+def ensure_mongo_indexes(collections):
+    for name, specs in MONGO_INDEXES.items():
+        collection = collections.get(name)
+        if collection is None:
+            continue
+        for spec in specs:
+            options = {key: value for key, value in spec.items() if key != "keys"}
+            collection.create_index(spec["keys"], **options)
+
+def provision_indexes():
+    from .mongo import activities_collection
+
+    ensure_sql_indexes()
+    ensure_mongo_indexes({"activities": activities_collection})
+    logger.info("Indexes provisioned")
+
+# -- diagnostics -----------------------------------------------------------
+
+# Representative parameters; only the shape of the plan matters
+HOT_SQL_QUERIES = {
+    "users by email (login, auth)": lambda db: db.query(User).filter(User.email == "someone@example.com"),
+    "students by department/year (get_students)": lambda db: db.query(User.id).filter(
+        User.role == "student", User.department == "CS", User.year == "3rd"
+    ).order_by(User.id),
+    "academic records by user (get_academic_records)": lambda db: db.query(AcademicRecord).filter(
+        AcademicRecord.user_id == 1
+    ),
+    "academic records by user/semester (bulk upsert)": lambda db: db.query(AcademicRecord).filter(
+        AcademicRecord.user_id.in_([1, 2]), AcademicRecord.semester.in_(["S1"])
+    ),
+    "skill postings by skill/department/year (skill search)": lambda db: db.query(SkillPosting.user_id).filter(
+        SkillPosting.skill.in_(["python", "ml"]), SkillPosting.department == "CS", SkillPosting.year == "3rd"
+    ),
+    "skills by prefix (autocomplete)": lambda db: db.query(Skill.label).filter(
+        Skill.skill >= "py", Skill.skill < "py\U0010ffff"
+    ),
+}
+
+HOT_MONGO_QUERIES = {
+    "student activities (get_activities)": (
+        {"user_id": 1}, [("created_at", -1), ("_id", -1)]
+    ),
+    "faculty pending queue (get_pending_activities)": (
+        {"status": "pending", "department": "CS", "year": "3rd"}, [("created_at", 1), ("_id", 1)]
+    ),
+    "text search (search_activities)": (
+        {"$text": {"$search": "hackathon 2025"}, "status": "approved"}, None
+    ),
+    "activity by id (approve/reject)": (
+        {"_id": ObjectId("000000000000000000000000")}, None
+    ),
+}
+
+def _explain_sql(db, query):
+    dialect = db.get_bind().dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        plan = [row[-1] for row in db.execute(text("EXPLAIN QUERY PLAN " + sql))]
+        full_scan = any(line.startswith("SCAN") and "INDEX" not in line for line in plan)
+    else:
+        plan = [row[0] for row in db.execute(text("EXPLAIN " + sql))]
+        full_scan = any("Seq Scan" in line for line in plan)
+    return plan, full_scan
+
+def _winning_stages(plan):
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _winning_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _winning_stages(child)
+    return [stage for stage in stages if stage]
+
+def explain_hot_queries(db, activities_collection):
+    """Return one report row per hot query, flagging full scans and failures."""
+    report = []
+    for name, build in HOT_SQL_QUERIES.items():
+        plan, full_scan = _explain_sql(db, build(db))
+        report.append({"store": "sql", "query": name, "plan": plan, "full_scan": full_scan})
+
+    for name, (query, sort) in HOT_MONGO_QUERIES.items():
+        try:
+            cursor = activities_collection.find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            explained = cursor.explain()
+        except (OperationFailure, ValueError) as exc:
+            # A $text query can't run at all without its text index
+            report.append({"store": "mongo", "query": name, "plan": [str(exc)], "full_scan": True, "failed": True})
+            continue
+        stages = _winning_stages(explained["queryPlanner"]["winningPlan"])
+        report.append({
+            "store": "mongo",
+            "query": name,
+            "plan": stages,
+            "full_scan": "COLLSCAN" in stages,
+        })
+    return report
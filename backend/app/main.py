@@ -1,13 +1,89 @@
+import logging
+
+import os
+
+import time
+
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from .config import settings
+
+from .database import engine, Base, SessionLocal
+
+from .indexes import provision_indexes
+
+from .mongo import store
+
+from .models.portfolio import StudentSummary
+
+from .metrics import MetricsMiddleware, render_metrics
+
+from .profiling import PROFILE_ID_HEADER, ProfilerMiddleware, profiler
+
+from .routers import auth, activities, academic, analytics, proofs, skills, profiling
+
+from .utils.pagination import NEXT_CURSOR_HEADER
+
+from .utils.auth import password_hasher
+
+from .utils.events import event_bus
 
-from .database import engine, Base
+from .utils.previews import preview_pipeline
 
-from .routers import auth, activities, academic, analytics
+from .utils.principal_cache import principal_cache
 
-Base.metadata.create_all(bind=engine)
+from .utils.skills import rebuild_skill_index
 
-app = FastAPI(title="Smart Student Hub API", version="1.0.0")
+from .utils.stats import rebuild_counters
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+def rebuild_read_models(collection):
+    # The SQL read models were maintained against the fallback store; after
+    # promotion they must describe MongoDB's data instead
+    db = SessionLocal()
+    try:
+        rebuild_counters(db, collection)
+        rebuild_skill_index(db, collection)
+        # Portfolio summaries are rebuilt on their next read
+        db.query(StudentSummary).delete()
+        db.commit()
+    finally:
+        db.close()
+
+def prepare_storage():
+    Base.metadata.create_all(bind=engine)
+    os.makedirs(settings.upload_dir, exist_ok=True)
+    # Serve from the fallback store until MongoDB answers, rather than
+    # blocking startup on the connection attempt
+    store.start_background()
+    provision_indexes()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start = time.perf_counter()
+    await run_in_threadpool(prepare_storage)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if elapsed_ms > settings.startup_budget_ms:
+        logger.warning("Startup took %.0f ms (budget %d ms)", elapsed_ms, settings.startup_budget_ms)
+    else:
+        logger.info("Startup took %.0f ms", elapsed_ms)
+
+    yield
+
+    store.stop_background()
+    password_hasher.shutdown()
+    preview_pipeline.shutdown()
+
+store.on_promote(rebuild_read_models)
+
+app = FastAPI(title="Smart Student Hub API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,21 +91,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, PROFILE_ID_HEADER],
 )
 
+app.add_middleware(ProfilerMiddleware, profiler=profiler, always=settings.profiling_enabled)
+
+if settings.metrics_enabled:
+    # Outermost, so latency covers CORS and every other layer
+    app.add_middleware(MetricsMiddleware, server_timing=settings.server_timing)
+
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(activities.router, prefix="/activities", tags=["Activities"])
 app.include_router(academic.router, prefix="/academic", tags=["Academic"])
 app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
-
-from fastapi.staticfiles import StaticFiles
-import os
-
-os.makedirs("uploads", exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.include_router(proofs.router, prefix="/uploads", tags=["Uploads"])
+app.include_router(skills.router, prefix="/skills", tags=["Skills"])
+app.include_router(profiling.router, prefix="/profiles", tags=["Profiling"])
 
 @app.get("/")
 
 def root():
 
-    return {"message": "Welcome to Smart Student Hub API"}
\ No newline at end of file
+    return {"message": "Welcome to Smart Student Hub API"}
+if settings.metrics_enabled:
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(
+            render_metrics({
+                "principal_cache": principal_cache.stats(),
+                "password_hasher": password_hasher.stats(),
+                "preview_pipeline": preview_pipeline.stats(),
+                "event_bus": event_bus.stats(),
+            }),
+            media_type="text/plain; version=0.0.4",
+        )
@@ -0,0 +1,271 @@
+"""Request metrics exposed in Prometheus text format on ``/metrics``.
+
+``MetricsMiddleware`` times every HTTP request by route template and keeps
+an in-flight gauge. SQL statements (SQLAlchemy engine events)
+and MongoDB commands (pymongo command monitoring) are attributed to the
+request that issued them through a context variable, which Starlette
+copies into threadpool workers. Statements-per-request histograms make
+N+1 query patterns stand out. Optionally each response also carries a
+``Server-Timing`` header with the same breakdown for browser devtools.
+
+Motor runs commands on its own executor threads, which do not inherit
+the request context, so with ``async_io`` Mongo commands are counted in
+the totals but not attributed to routes.
+"""
+
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from pymongo import monitoring
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Statements/commands per request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+# Label for requests that matched no route, so 404 scans can't blow up
+# the number of series
+UNMATCHED = "unmatched"
+
+class RequestStats:
+
+    __slots__ = ("sql_count", "sql_seconds", "mongo_count", "mongo_seconds")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.mongo_count = 0
+        self.mongo_seconds = 0.0
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+def current_stats():
+    """Stats of the request being handled, or None outside a request."""
+    return _current.get()
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Registry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)  # (method, route, status)
+        self.in_flight = 0
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.sql_statements = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self.sql_seconds = defaultdict(float)
+        self.mongo_commands = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self.mongo_seconds = defaultdict(float)
+        # Work done outside any request (startup, background jobs, Motor)
+        self.sql_total = 0
+        self.mongo_total = 0
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def exit(self, key, status, elapsed, stats: RequestStats):
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[key + (status,)] += 1
+            self.latency[key].observe(elapsed)
+            self.sql_statements[key].observe(stats.sql_count)
+            self.sql_seconds[key] += stats.sql_seconds
+            self.mongo_commands[key].observe(stats.mongo_count)
+            self.mongo_seconds[key] += stats.mongo_seconds
+
+    def count_sql(self):
+        with self._lock:
+            self.sql_total += 1
+
+    def count_mongo(self):
+        with self._lock:
+            self.mongo_total += 1
+
+registry = Registry()
+
+# -- SQL and Mongo hooks ---------------------------------------------------
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    registry.count_sql()
+    stats = _current.get()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_seconds += elapsed
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # The statement failed, so after_cursor_execute won't pop its start time
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("metrics_start"):
+        connection.info["metrics_start"].pop()
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Counts MongoDB commands; pass to the client as an event listener."""
+
+    def started(self, event):
+        pass
+
+    def _record(self, event):
+        registry.count_mongo()
+        stats = _current.get()
+        if stats is not None:
+            stats.mongo_count += 1
+            stats.mongo_seconds += event.duration_micros / 1e6
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+mongo_listener = MongoCommandListener()
+
+# -- middleware ------------------------------------------------------------
+
+def route_template(scope):
+    """Path template of the route that handled ``scope`` ("/activities/{activity_id}/approve").
+
+    Rebuilt from the matched path parameters, which the router has added
+    to the scope by the time the response starts.
+    """
+    if "endpoint" not in scope:
+        return UNMATCHED
+    params = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    if not params:
+        return scope["path"]
+    segments = []
+    for segment in scope["path"].split("/"):
+        name = params.pop(segment, None)
+        segments.append(segment if name is None else "{" + name + "}")
+    return "/".join(segments)
+
+def server_timing(elapsed, stats: RequestStats) -> str:
+    return (
+        f'app;dur={elapsed * 1000:.1f}, '
+        f'sql;dur={stats.sql_seconds * 1000:.1f};desc="{stats.sql_count} statements", '
+        f'mongo;dur={stats.mongo_seconds * 1000:.1f};desc="{stats.mongo_count} commands"'
+    )
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses pass through untouched."""
+
+    def __init__(self, app, server_timing=False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+        registry.enter()
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("server-timing", server_timing(time.perf_counter() - start, stats))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            key = (scope["method"], route_template(scope))
+            registry.exit(key, status, time.perf_counter() - start, stats)
+            _current.reset(token)
+
+# -- exposition ------------------------------------------------------------
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels):
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return "{" + body + "}" if body else ""
+
+def _histogram(lines, name, help_text, histograms):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.count}")
+
+def _per_route(lines, name, kind, help_text, values):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for (method, route), value in sorted(values.items()):
+        lines.append(f"{name}{_labels(method=method, route=route)} {value}")
+
+def render_metrics(components=None) -> str:
+    """Prometheus text exposition of the registry plus ``{component: stats dict}`` gauges."""
+    with registry._lock:
+        lines = [
+            "# HELP http_requests_total HTTP requests by route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(registry.requests.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+        lines += [
+            "# HELP http_requests_in_flight Requests being handled.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {registry.in_flight}",
+        ]
+        _histogram(lines, "http_request_duration_seconds", "Request latency.", registry.latency)
+        _histogram(lines, "http_request_sql_statements", "SQL statements per request.", registry.sql_statements)
+        _per_route(lines, "http_request_sql_seconds_total", "counter", "Time spent in SQL statements.", registry.sql_seconds)
+        _histogram(lines, "http_request_mongo_commands", "MongoDB commands per request.", registry.mongo_commands)
+        _per_route(lines, "http_request_mongo_seconds_total", "counter", "Time spent in MongoDB commands.", registry.mongo_seconds)
+        lines += [
+            "# HELP sql_statements_total SQL statements, including those outside requests.",
+            "# TYPE sql_statements_total counter",
+            f"sql_statements_total {registry.sql_total}",
+            "# HELP mongo_commands_total MongoDB commands, including those outside requests.",
+            "# TYPE mongo_commands_total counter",
+            f"mongo_commands_total {registry.mongo_total}",
+        ]
+
+    for component, values in (components or {}).items():
+        for key, value in values.items():
+            if isinstance(value, (int, float)):
+                name = f"app_{component}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,594 @@
+"""In-memory stand-in for a pymongo collection.
+
+Used when MongoDB is unreachable (local development, CI, load testing).
+Documents live in a dict keyed by ``_id`` and the hot query fields have
+hash indexes, so lookups cost roughly what they would on an indexed
+MongoDB collection instead of a full scan.
+"""
+
+import copy
+import re
+import threading
+from collections import defaultdict
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from .textindex import TextIndex
+
+ASCENDING = 1
+DESCENDING = -1
+
+# Values that cannot be hashed (dicts) are filed under this key and are
+# always returned as index candidates, then checked by the matcher.
+_UNHASHABLE = object()
+_MISSING = object()
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+class UpdateResult:
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+def get_path(doc, path, default=None):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return default
+    return value
+
+def set_path(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+def unset_path(doc, path):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+def _compare(op, actual, expected):
+    try:
+        if op == "$gt":
+            return actual > expected
+        if op == "$gte":
+            return actual >= expected
+        if op == "$lt":
+            return actual < expected
+        if op == "$lte":
+            return actual <= expected
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported operator {op}")
+
+def _equals(actual, expected):
+    if isinstance(actual, list) and not isinstance(expected, list):
+        return expected in actual
+    return actual == expected
+
+def _match_operators(actual, spec):
+    for op, expected in spec.items():
+        if op == "$eq":
+            ok = _equals(actual, expected)
+        elif op == "$ne":
+            ok = not _equals(actual, expected)
+        elif op == "$in":
+            ok = any(_equals(actual, value) for value in expected)
+        elif op == "$nin":
+            ok = not any(_equals(actual, value) for value in expected)
+        elif op == "$exists":
+            ok = (actual is not _MISSING) == bool(expected)
+        elif op == "$regex":
+            pattern = re.compile(expected, re.IGNORECASE if "i" in spec.get("$options", "") else 0)
+            values = actual if isinstance(actual, list) else [actual]
+            ok = any(isinstance(value, str) and pattern.search(value) for value in values)
+        elif op == "$options":
+            ok = True
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            if actual is _MISSING or actual is None:
+                return False
+            values = actual if isinstance(actual, list) else [actual]
+            ok = any(_compare(op, value, expected) for value in values)
+        else:
+            raise ValueError(f"Unsupported query operator {op}")
+        if not ok:
+            return False
+    return True
+
+def matches(doc, query):
+    """Evaluate a MongoDB-style filter document against ``doc``.
+
+    ``$text`` is resolved by the collection's text index when choosing
+    candidates, so it is not re-checked here.
+    """
+    for key, condition in (query or {}).items():
+        if key == "$text":
+            continue
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, sub) for sub in condition):
+                return False
+        else:
+            actual = get_path(doc, key, _MISSING)
+            if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+                if not _match_operators(actual, condition):
+                    return False
+            elif actual is _MISSING:
+                if condition is not None:
+                    return False
+            elif not _equals(actual, condition):
+                return False
+    return True
+
+def project(doc, projection):
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = projection.get("_id", 1)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and all(fields.values()):
+        out = {}
+        for field in fields:
+            value = get_path(doc, field, _MISSING)
+            if value is not _MISSING:
+                set_path(out, field, value)
+    else:
+        out = dict(doc)
+        for field in fields:
+            unset_path(out, field)
+    if include_id and "_id" in doc:
+        out["_id"] = doc["_id"]
+    elif not include_id:
+        out.pop("_id", None)
+    return out
+
+def apply_update(doc, update, inserting=False):
+    """Apply update operators in place, returning True if ``doc`` changed."""
+    before = copy.deepcopy(doc)
+    for op, fields in update.items():
+        if op == "$set" or (op == "$setOnInsert" and inserting):
+            for path, value in fields.items():
+                set_path(doc, path, copy.deepcopy(value))
+        elif op == "$setOnInsert":
+            continue
+        elif op == "$unset":
+            for path in fields:
+                unset_path(doc, path)
+        elif op == "$inc":
+            for path, value in fields.items():
+                set_path(doc, path, get_path(doc, path, 0) + value)
+        elif op == "$push":
+            for path, value in fields.items():
+                values = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                set_path(doc, path, list(get_path(doc, path, [])) + copy.deepcopy(values))
+        elif op == "$addToSet":
+            for path, value in fields.items():
+                current = list(get_path(doc, path, []))
+                values = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                current.extend(v for v in values if v not in current)
+                set_path(doc, path, current)
+        elif op == "$pull":
+            for path, value in fields.items():
+                current = get_path(doc, path, [])
+                set_path(doc, path, [v for v in current if v != value])
+        else:
+            raise ValueError(f"Unsupported update operator {op}")
+    return doc != before
+
+def _sort_key(value):
+    # None/missing sort first, as in MongoDB
+    return (value is not None, value)
+
+def _is_text_score(value):
+    return isinstance(value, dict) and value.get("$meta") == "textScore"
+
+class MockCursor:
+    """Chainable cursor supporting sort/skip/limit, like pymongo's."""
+
+    def __init__(self, collection, query, projection=None, candidates=None, scores=None):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._candidates = candidates
+        self._scores = scores or {}
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=ASCENDING):
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def _documents(self):
+        docs = self._collection._scan(self._query, self._candidates)
+        for field, direction in reversed(self._sort):
+            if _is_text_score(direction):
+                # Best match first, as MongoDB sorts textScore
+                docs.sort(key=lambda d: self._scores.get(d["_id"], 0.0), reverse=True)
+            else:
+                docs.sort(key=lambda d: _sort_key(get_path(d, field)), reverse=direction == DESCENDING)
+
+        projection = self._projection
+        score_fields = []
+        if isinstance(projection, dict):
+            score_fields = [field for field, value in projection.items() if _is_text_score(value)]
+            projection = {k: v for k, v in projection.items() if k not in score_fields}
+
+        end = self._skip + self._limit if self._limit else None
+        for doc in docs[self._skip:end]:
+            out = project(copy.deepcopy(doc), projection)
+            for field in score_fields:
+                out[field] = self._scores.get(doc["_id"], 0.0)
+            yield out
+
+    def __iter__(self):
+        return self._documents()
+
+    def explain(self):
+        # Mirrors the shape of MongoDB's explain() output closely enough
+        # for the index diagnostics
+        stage = "COLLSCAN" if self._candidates is None else "IXSCAN"
+        examined = len(self._collection._keys()) if self._candidates is None else len(self._candidates)
+        return {
+            "queryPlanner": {"winningPlan": {"stage": stage}},
+            "executionStats": {"totalDocsExamined": examined},
+        }
+
+class MockCollection:
+    """Indexed in-memory document store with the pymongo collection API."""
+
+    INDEXED_FIELDS = ("user_id", "status")
+
+    def __init__(self, name):
+        self.name = name
+        self.data = {}
+        self.indexes = {field: defaultdict(set) for field in self.INDEXED_FIELDS}
+        self.text_index = None
+        self._lock = threading.RLock()
+        self._successor = None
+
+    # -- storage hooks -----------------------------------------------------
+
+    def _keys(self):
+        return list(self.data.keys())
+
+    def _load(self, key):
+        return self.data.get(key)
+
+    def _store(self, key, doc):
+        self.data[key] = doc
+
+    def _discard(self, key):
+        self.data.pop(key, None)
+
+    # -- secondary indexes -------------------------------------------------
+
+    @staticmethod
+    def _index_values(value):
+        values = value if isinstance(value, list) else [value]
+        out = set()
+        for item in values:
+            try:
+                hash(item)
+                out.add(item)
+            except TypeError:
+                out.add(_UNHASHABLE)
+        return out
+
+    def _index_add(self, key, doc):
+        for field, index in self.indexes.items():
+            for value in self._index_values(get_path(doc, field)):
+                index[value].add(key)
+        if self.text_index is not None:
+            self.text_index.add(key, doc, get_path)
+
+    def _index_remove(self, key, doc):
+        if self.text_index is not None:
+            self.text_index.remove(key, doc, get_path)
+        for field, index in self.indexes.items():
+            for value in self._index_values(get_path(doc, field)):
+                bucket = index.get(value)
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del index[value]
+
+    def _index_lookup(self, index, condition):
+        if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            if set(condition) == {"$eq"}:
+                wanted = [condition["$eq"]]
+            elif set(condition) == {"$in"}:
+                wanted = condition["$in"]
+            else:
+                return None
+        elif isinstance(condition, (list, dict)):
+            return None
+        else:
+            wanted = [condition]
+        keys = set(index.get(_UNHASHABLE, ()))
+        for value in wanted:
+            try:
+                keys |= index.get(value, set())
+            except TypeError:
+                return None
+        return keys
+
+    def _text_scores(self, query):
+        if not query or "$text" not in query:
+            return None
+        if self.text_index is None:
+            raise ValueError("text index required for $text query")
+        return self.text_index.search(query["$text"]["$search"])
+
+    def _candidates(self, query, scores=None):
+        """Narrow a query to candidate keys via indexes, or None for a scan."""
+        if not query:
+            return None
+        candidates = None
+        if scores is None:
+            scores = self._text_scores(query)
+        if scores is not None:
+            candidates = set(scores)
+        if "_id" in query:
+            condition = query["_id"]
+            keys = None
+            if isinstance(condition, dict) and set(condition) == {"$in"}:
+                keys = set(condition["$in"])
+            elif not isinstance(condition, dict):
+                keys = {condition}
+            if keys is not None:
+                candidates = keys if candidates is None else candidates & keys
+        for field, index in self.indexes.items():
+            if field not in query:
+                continue
+            keys = self._index_lookup(index, query[field])
+            if keys is not None:
+                candidates = keys if candidates is None else candidates & keys
+        return candidates
+
+    def _scan(self, query, candidates=None):
+        with self._lock:
+            keys = self._keys() if candidates is None else list(candidates)
+            out = []
+            for key in keys:
+                doc = self._load(key)
+                if doc is not None and matches(doc, query):
+                    out.append(doc)
+            return out
+
+    def _find_keys(self, query, limit=0):
+        docs = self._scan(query, self._candidates(query))
+        docs = docs[:limit] if limit else docs
+        return [doc["_id"] for doc in docs]
+
+    # -- collection API ----------------------------------------------------
+
+    def retire(self, successor):
+        """Send writes still waiting on the lock to ``successor`` from now on.
+
+        Callers resolved this collection before it was replaced; without
+        this their writes would land in a store nobody reads any more.
+        """
+        with self._lock:
+            self._successor = successor
+
+    def create_index(self, keys, **kwargs):
+        # Every field of a compound index gets its own hash index; the
+        # candidate sets are intersected at query time
+        if isinstance(keys, str):
+            keys = [(keys, ASCENDING)]
+        text_fields = [field for field, kind in keys if kind == "text"]
+        keys = [(field, kind) for field, kind in keys if kind != "text"]
+        with self._lock:
+            if text_fields:
+                weights = kwargs.get("weights") or {}
+                self.text_index = TextIndex({field: weights.get(field, 1) for field in text_fields})
+                for key in self._keys():
+                    self.text_index.add(key, self._load(key), get_path)
+            for field, _ in keys:
+                if field == "_id" or field in self.indexes:
+                    continue
+                self.indexes[field] = defaultdict(set)
+                for key in self._keys():
+                    doc = self._load(key)
+                    for value in self._index_values(get_path(doc, field)):
+                        self.indexes[field][value].add(key)
+        return kwargs.get("name") or "_".join(f"{f}_{d}" for f, d in keys + [(f, "text") for f in text_fields])
+
+    def insert_one(self, document):
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        with self._lock:
+            if self._successor is not None:
+                return self._successor.insert_one(document)
+            if self._load(document["_id"]) is not None:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_ dup key: {document['_id']}")
+            stored = copy.deepcopy(document)
+            self._store(stored["_id"], stored)
+            self._index_add(stored["_id"], stored)
+        return InsertOneResult(document["_id"])
+
+    def insert_many(self, documents):
+        return InsertManyResult([self.insert_one(doc).inserted_id for doc in documents])
+
+    def find(self, query=None, projection=None):
+        with self._lock:
+            scores = self._text_scores(query)
+            candidates = self._candidates(query, scores)
+        return MockCursor(self, query or {}, projection, candidates, scores)
+
+    def find_one(self, query=None, projection=None):
+        for doc in self.find(query, projection).limit(1):
+            return doc
+        return None
+
+    def count_documents(self, query=None):
+        query = query or {}
+        candidates = self._candidates(query)
+        if candidates is None and not query:
+            return len(self._keys())
+        return len(self._scan(query, candidates))
+
+    def _update(self, query, update, upsert, many):
+        with self._lock:
+            if self._successor is not None:
+                method = self._successor.update_many if many else self._successor.update_one
+                return method(query, update, upsert=upsert)
+            keys = self._find_keys(query, limit=0 if many else 1)
+            modified = 0
+            for key in keys:
+                doc = copy.deepcopy(self._load(key))
+                old = copy.deepcopy(doc)
+                if apply_update(doc, update):
+                    self._index_remove(key, old)
+                    self._store(key, doc)
+                    self._index_add(key, doc)
+                    modified += 1
+            if keys or not upsert:
+                return UpdateResult(len(keys), modified)
+
+            doc = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+            apply_update(doc, update, inserting=True)
+            upserted_id = self.insert_one(doc).inserted_id
+            return UpdateResult(0, 0, upserted_id)
+
+    def find_one_and_update(self, query, update, projection=None, return_document=False):
+        """Atomically update one match; returns it as it was (or after, if ``return_document``)."""
+        with self._lock:
+            if self._successor is not None:
+                return self._successor.find_one_and_update(
+                    query, update, projection=projection, return_document=return_document
+                )
+            keys = self._find_keys(query, limit=1)
+            if not keys:
+                return None
+            key = keys[0]
+            doc = copy.deepcopy(self._load(key))
+            old = copy.deepcopy(doc)
+            if apply_update(doc, update):
+                self._index_remove(key, old)
+                self._store(key, doc)
+                self._index_add(key, doc)
+            return project(doc if return_document else old, projection)
+
+    def replace_one(self, query, replacement, upsert=False):
+        with self._lock:
+            if self._successor is not None:
+                return self._successor.replace_one(query, replacement, upsert=upsert)
+            keys = self._find_keys(query, limit=1)
+            if not keys:
+                if not upsert:
+                    return UpdateResult(0, 0)
+                doc = copy.deepcopy(replacement)
+                if "_id" in query and not isinstance(query["_id"], dict):
+                    doc.setdefault("_id", query["_id"])
+                return UpdateResult(0, 0, self.insert_one(doc).inserted_id)
+            key = keys[0]
+            doc = copy.deepcopy(replacement)
+            doc["_id"] = key
+            self._index_remove(key, self._load(key))
+            self._store(key, doc)
+            self._index_add(key, doc)
+            return UpdateResult(1, 1)
+
+    def update_one(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=False)
+
+    def update_many(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=True)
+
+    def _delete(self, query, many):
+        with self._lock:
+            if self._successor is not None:
+                method = self._successor.delete_many if many else self._successor.delete_one
+                return method(query)
+            keys = self._find_keys(query, limit=0 if many else 1)
+            for key in keys:
+                self._index_remove(key, self._load(key))
+                self._discard(key)
+            return DeleteResult(len(keys))
+
+    def delete_one(self, query):
+        return self._delete(query, many=False)
+
+    def delete_many(self, query):
+        return self._delete(query, many=True)
+
+    def aggregate(self, pipeline):
+        # Only the stages used by the analytics layer: $match and $group.
+        # A leading $match goes through the indexes like find() does.
+        docs = None
+        for stage in pipeline:
+            if "$match" in stage:
+                query = stage["$match"]
+                if docs is None:
+                    docs = self._scan(query, self._candidates(query))
+                else:
+                    docs = [doc for doc in docs if matches(doc, query)]
+            elif "$group" in stage:
+                docs = _group(self._scan({}) if docs is None else docs, stage["$group"])
+            else:
+                raise ValueError(f"Unsupported aggregation stage {next(iter(stage), None)}")
+        if docs is None:
+            docs = self._scan({})
+        return [copy.deepcopy(doc) for doc in docs]
+
+def _evaluate(expr, doc):
+    if isinstance(expr, str) and expr.startswith("$"):
+        return get_path(doc, expr[1:])
+    if isinstance(expr, dict):
+        if "$dateToString" in expr:
+            value = _evaluate(expr["$dateToString"]["date"], doc)
+            return value.strftime(expr["$dateToString"]["format"]) if value else None
+        return {k: _evaluate(v, doc) for k, v in expr.items()}
+    return expr
+
+def _group(docs, spec):
+    groups = {}
+    for doc in docs:
+        key = _evaluate(spec["_id"], doc)
+        hashable = tuple(sorted(key.items())) if isinstance(key, dict) else key
+        group = groups.setdefault(hashable, {"_id": key})
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            if set(accumulator) != {"$sum"}:
+                raise ValueError(f"Unsupported accumulator {next(iter(accumulator), None)}")
+            value = _evaluate(accumulator["$sum"], doc)
+            group[field] = group.get(field, 0) + (value or 0)
+    return list(groups.values())
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String
+
+from ..database import Base
+
+class AnalyticsCounter(Base):
+
+    __tablename__ = "analytics_counters"
+
+    scope = Column(String, primary_key=True)  # totals, department, status, category, month
+
+    key = Column(String, primary_key=True)
+
+    value = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, JSON
+
+from sqlalchemy.sql import func
+
+from ..database import Base
+
+class StudentSummary(Base):
+
+    # Read model behind the portfolio endpoint, maintained incrementally
+    # by utils/portfolio.py
+
+    __tablename__ = "student_summaries"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    cgpa = Column(Float, nullable=True)
+
+    credits_earned = Column(Integer, nullable=False, default=0)
+
+    total_credits = Column(Integer, nullable=False, default=0)
+
+    semesters = Column(Integer, nullable=False, default=0)
+
+    approved_activities = Column(Integer, nullable=False, default=0)
+
+    activities_by_category = Column(JSON, nullable=False, default=dict)
+
+    # normalized skill -> {"skill": display label, "count": n}
+    skills = Column(JSON, nullable=False, default=dict)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
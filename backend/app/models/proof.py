@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+
+from sqlalchemy.sql import func
+
+from ..database import Base
+
+class ProofUpload(Base):
+
+    # Who uploaded which content-addressed proof file; used for access checks
+
+    __tablename__ = "proof_uploads"
+
+    sha256 = Column(String, primary_key=True)
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    size = Column(Integer)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,43 @@
+from sqlalchemy import Column, Integer, String, Index
+
+from ..database import Base
+
+class Skill(Base):
+
+    # One row per normalized skill; backs prefix autocomplete
+
+    __tablename__ = "skills"
+
+    skill = Column(String, primary_key=True)
+
+    label = Column(String, nullable=False)
+
+    activity_count = Column(Integer, nullable=False, default=0)
+
+class SkillPosting(Base):
+
+    # Inverted index: normalized skill -> approved activity and its student
+
+    __tablename__ = "skill_postings"
+
+    skill = Column(String, primary_key=True)
+
+    activity_id = Column(String, primary_key=True)
+
+    user_id = Column(Integer, nullable=False)
+
+    department = Column(String, nullable=True)
+
+    year = Column(String, nullable=True)
+
+    __table_args__ = (
+
+        # Placement search: skill filtered by department/year
+
+        Index("ix_skill_postings_skill_department_year", "skill", "department", "year", "user_id"),
+
+        Index("ix_skill_postings_activity_id", "activity_id"),
+
+        Index("ix_skill_postings_user_id", "user_id"),
+
+    )
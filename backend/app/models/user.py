@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Index
 
 from sqlalchemy.sql import func
 
@@ -26,6 +26,14 @@ class User(Base):
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+
+        # Faculty listings filter students by department and year
+
+        Index("ix_users_role_department_year", "role", "department", "year"),
+
+    )
+
 class AcademicRecord(Base):
 
     __tablename__ = "academic_records"
@@ -40,4 +48,11 @@ class AcademicRecord(Base):
 
     credits_earned = Column(Integer)
 
-    total_credits = Column(Integer)
\ No newline at end of file
+    total_credits = Column(Integer)
+
+    __table_args__ = (
+
+        # One record per student and semester; writers upsert on it
+        Index("uq_academic_records_user_id_semester", "user_id", "semester", unique=True),
+
+    )
\ No newline at end of file
@@ -1,64 +1,267 @@
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 import logging
+import threading
+
+from starlette.concurrency import run_in_threadpool
 
 from .config import settings
+from .mockdb import MockCollection
+from .filestore import FileCollection
+from .metrics import mongo_listener
 
 logger = logging.getLogger(__name__)
 
-class MockCollection:
-    def __init__(self, name):
-        self.name = name
-        self.data = {}
-
-    def insert_one(self, document):
-        if "_id" not in document:
-            from bson import ObjectId
-            document["_id"] = ObjectId()
-        self.data[str(document["_id"])] = document
-        class Result:
-            def __init__(self, id):
-                self.inserted_id = id
-        return Result(document["_id"])
-
-    def find(self, query=None):
-        out = []
-        for doc in self.data.values():
-            match = True
-            if query:
-                for k, v in query.items():
-                    if k == "user_id" and v != doc.get("user_id"):
-                        match = False
-                    if k == "status" and v != doc.get("status"):
-                        match = False
-                    # Basic $in support for faculty dashboard
-                    if isinstance(v, dict) and "$in" in v:
-                        if doc.get(k) not in v["$in"]:
-                            match = False
-            if match:
-                out.append(doc.copy())
-        return out
-
-    def find_one(self, query):
-        results = self.find(query)
-        return results[0] if results else None
-
-    def update_one(self, query, update):
-        doc = self.find_one(query)
-        if doc:
-            if "$set" in update:
-                doc.update(update["$set"])
-        return None
-
-try:
-    client = MongoClient(settings.mongo_url, serverSelectionTimeoutMS=2000)
-    # The is_master command is cheap and does not require auth.
-    client.admin.command('ismaster')
-    db = client["smart_student_hub"]
-    activities_collection = db["activities"]
-    mongo_available = True
-    logger.info("Connected to MongoDB")
-except (ConnectionFailure, ServerSelectionTimeoutError, Exception):
-    logger.error("Could not connect to MongoDB. Using in-memory mock for activities.")
-    activities_collection = MockCollection("activities")
-    mongo_available = False
+DATABASE_NAME = "smart_student_hub"
+
+def _open_fallback():
+    if settings.fallback_store == "file":
+        return FileCollection(
+            "activities",
+            settings.fallback_store_dir,
+            fsync=settings.fallback_store_fsync,
+            cache_size=settings.fallback_store_cache_size,
+        )
+    return MockCollection("activities")
+
+def _fallback_description():
+    if settings.fallback_store == "file":
+        return f"file-backed store in {settings.fallback_store_dir}"
+    return "in-memory mock"
+
+class ActivityStore:
+    """Resolves the activities collection on first use instead of at import.
+
+    Scripts call ``collection()`` and get MongoDB if it answers within
+    ``mongo_connect_timeout_ms``, else the fallback store, as before. The
+    app instead calls ``start_background()`` at startup: it serves from the
+    fallback right away and keeps trying MongoDB on a background thread.
+    Once MongoDB answers, the store is promoted: indexes are created and
+    every fallback document is upserted into MongoDB while the fallback
+    keeps serving. Then, with fallback writes briefly held on its lock,
+    documents changed during that copy are upserted again, the fallback is
+    emptied and the collection is swapped; writes still waiting go to
+    MongoDB. Finally the ``on_promote`` hooks rebuild the read models from
+    the merged data. A failed step is logged and retried.
+    """
+
+    def __init__(self):
+        self.mongo_available = False
+        self._lock = threading.Lock()
+        self._collection = None
+        self._async_collection = None
+        self._client = None
+        self._hooks = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _connect():
+        """A client if MongoDB answers within the connect timeout, else None."""
+        client = None
+        try:
+            client = MongoClient(
+                settings.mongo_url,
+                serverSelectionTimeoutMS=settings.mongo_connect_timeout_ms,
+                event_listeners=[mongo_listener],
+            )
+            # The ping command is cheap and does not require auth.
+            client.admin.command("ping")
+            return client
+        except (ConnectionFailure, ServerSelectionTimeoutError, Exception):
+            if client is not None:
+                client.close()
+            return None
+
+    def _use_mongo(self, client):
+        self._client = client
+        self._collection = client[DATABASE_NAME]["activities"]
+        self._async_collection = None
+        self.mongo_available = True
+
+    def collection(self):
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    client = self._connect()
+                    if client is not None:
+                        self._use_mongo(client)
+                        logger.info("Connected to MongoDB")
+                    else:
+                        logger.error("Could not connect to MongoDB. Using %s for activities.", _fallback_description())
+                        self._collection = _open_fallback()
+        return self._collection
+
+    def async_collection(self):
+        collection = self.collection()
+        if self._async_collection is None:
+            with self._lock:
+                if self._async_collection is None:
+                    if settings.async_io and self.mongo_available:
+                        from motor.motor_asyncio import AsyncIOMotorClient
+
+                        client = AsyncIOMotorClient(settings.mongo_url, event_listeners=[mongo_listener])
+                        self._async_collection = client[DATABASE_NAME]["activities"]
+                    else:
+                        self._async_collection = AsyncCollection(collection)
+        return self._async_collection
+
+    def on_promote(self, hook):
+        """Call ``hook(collection)`` with MongoDB's collection once promoted to it.
+
+        Hooks are re-run until all of them succeed, so they must be idempotent.
+        """
+        self._hooks.append(hook)
+
+    def start_background(self):
+        with self._lock:
+            if self.mongo_available or self._thread is not None:
+                return
+            if self._collection is None:
+                logger.warning("MongoDB not connected yet. Serving activities from %s meanwhile.", _fallback_description())
+                self._collection = _open_fallback()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._connect_loop, name="mongo-connect", daemon=True)
+            self._thread.start()
+
+    def stop_background(self, timeout=5.0):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _connect_loop(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    if not self.mongo_available:
+                        client = self._connect()
+                        if client is not None:
+                            self._promote(client)
+                    if self.mongo_available:
+                        # Read models still describe the fallback's data
+                        # until every hook has run
+                        for hook in self._hooks:
+                            hook(self._collection)
+                        return
+                except Exception:
+                    logger.exception("Promotion to MongoDB failed; retrying in %ss", settings.mongo_retry_seconds)
+                self._stop.wait(settings.mongo_retry_seconds)
+        finally:
+            self._thread = None
+
+    def _promote(self, client):
+        from .indexes import ensure_mongo_indexes
+
+        collection = client[DATABASE_NAME]["activities"]
+        fallback = self._collection
+        try:
+            ensure_mongo_indexes({"activities": collection})
+
+            # The fallback holds the newest copy of everything written to it,
+            # including updates to activities MongoDB already had. Stored
+            # documents are replaced, never mutated, so the copies taken here
+            # show what changed once writes are held.
+            copied = {}
+            for key in fallback._keys():
+                doc = fallback._load(key)
+                if doc is not None:
+                    collection.replace_one({"_id": key}, doc, upsert=True)
+                    copied[key] = doc
+
+            total = len(copied)
+            with fallback._lock:
+                for key in fallback._keys():
+                    doc = fallback._load(key)
+                    previous = copied.pop(key, None)
+                    if doc is not None and doc is not previous and doc != previous:
+                        collection.replace_one({"_id": key}, doc, upsert=True)
+                        if previous is None:
+                            total += 1
+                for key in copied:
+                    # Deleted from the fallback during the copy
+                    collection.delete_one({"_id": key})
+                # A file-backed fallback would otherwise serve these stale
+                # copies again during the next outage
+                fallback.delete_many({})
+                if isinstance(fallback, FileCollection):
+                    fallback.compact()
+                with self._lock:
+                    self._use_mongo(client)
+                fallback.retire(collection)
+        except Exception:
+            if not self.mongo_available:
+                client.close()
+            raise
+        logger.info("Connected to MongoDB; promoted from the fallback store (%d activities copied)", total)
+
+class CollectionProxy:
+    """Stands in for a collection that is resolved (and may be swapped) later."""
+
+    def __init__(self, resolve):
+        self._resolve = resolve
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+class AsyncCursor:
+    """Awaitable cursor over a sync collection, mirroring Motor's API."""
+
+    def __init__(self, collection, method, *args, **kwargs):
+        self._collection = collection
+        self._method = method
+        self._args = args
+        self._kwargs = kwargs
+        self._chain = []
+
+    def sort(self, *args):
+        self._chain.append(("sort", args))
+        return self
+
+    def skip(self, count):
+        self._chain.append(("skip", (count,)))
+        return self
+
+    def limit(self, count):
+        self._chain.append(("limit", (count,)))
+        return self
+
+    def _fetch(self, length):
+        cursor = getattr(self._collection, self._method)(*self._args, **self._kwargs)
+        for name, args in self._chain:
+            cursor = getattr(cursor, name)(*args)
+        docs = list(cursor)
+        return docs[:length] if length else docs
+
+    async def to_list(self, length=None):
+        return await run_in_threadpool(self._fetch, length)
+
+class AsyncCollection:
+    """Motor-style facade that runs a sync collection on the threadpool.
+
+    Lets the async routes share one code path whether they talk to Motor
+    or to pymongo / the fallback store.
+    """
+
+    def __init__(self, collection):
+        self.sync = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.sync, "find", *args, **kwargs)
+
+    def aggregate(self, *args, **kwargs):
+        return AsyncCursor(self.sync, "aggregate", *args, **kwargs)
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(method, *args, **kwargs)
+
+        return call
+
+store = ActivityStore()
+
+activities_collection = CollectionProxy(store.collection)
+
+async_activities_collection = CollectionProxy(store.async_collection)
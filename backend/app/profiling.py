@@ -0,0 +1,197 @@
+"""Opt-in sampling profiler for slow requests.
+
+A request is profiled when ``settings.profiling_enabled`` is on, or when an
+admin sends ``X-Profile: 1`` (the admin check uses the role claim of the
+bearer token). Otherwise the middleware only scans the request headers.
+
+While any profiled request is in flight, one background thread samples
+the stacks of every thread every ``profile_interval_ms``. Samples are
+credited to each profiled request running at the time. Threads that are
+idle (waiting on a lock, queue or selector) are skipped. This covers
+async handlers on the event loop and sync handlers and ``run_db`` work on
+the threadpool alike. Under concurrency a profile can include frames from
+other requests.
+
+Finished profiles are kept in a bounded buffer of the ``profile_keep``
+slowest. Each holds collapsed stacks (``frame;frame;frame count``, the
+input format of flamegraph.pl and speedscope).
+"""
+
+import heapq
+import itertools
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from starlette.datastructures import MutableHeaders
+
+from .config import settings
+from .utils.auth import verify_token
+
+PROFILE_HEADER = b"x-profile"
+
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Leaf frames of threads parked with nothing to do
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    # pymongo's server monitors sleep between heartbeats
+    ("pymongo/periodic_executor.py", "_run"),
+}
+
+def _frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", code.co_filename)
+    return f"{module}:{code.co_name}"
+
+def _is_idle(frame):
+    code = frame.f_code
+    return any(code.co_filename.endswith(path) and code.co_name == name for path, name in _IDLE_FRAMES)
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class RequestProfile:
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.status = None
+        self.samples = 0
+        self.stacks = Counter()
+        self.id = None
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 1),
+            "samples": self.samples,
+            "started_at": self.started_at,
+        }
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class Profiler:
+    """Shared sampler thread plus the buffer of the slowest profiles."""
+
+    def __init__(self, interval_ms, keep):
+        self.interval = interval_ms / 1000
+        self.keep = keep
+        self._active = set()
+        self._slowest = []  # min-heap of (duration, id, profile)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, method, path) -> RequestProfile:
+        profile = RequestProfile(method, path)
+        with self._lock:
+            profile.id = next(self._ids)
+            self._active.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+                self._thread.start()
+        return profile
+
+    def finish(self, profile: RequestProfile, status):
+        profile.duration = time.perf_counter() - profile.start
+        profile.status = status
+        with self._lock:
+            self._active.discard(profile)
+            entry = (profile.duration, profile.id, profile)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            elif self._slowest and entry > self._slowest[0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def _sample(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._thread = None
+                    return
+            stacks = [
+                _collapse(frame)
+                for ident, frame in sys._current_frames().items()
+                if ident != me and not _is_idle(frame)
+            ]
+            for profile in active:
+                profile.samples += 1
+                profile.stacks.update(stacks)
+            time.sleep(self.interval)
+
+    def profiles(self):
+        with self._lock:
+            ranked = sorted(self._slowest, reverse=True)
+        return [profile.summary() for _, _, profile in ranked]
+
+    def get(self, profile_id):
+        with self._lock:
+            for _, _, profile in self._slowest:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._slowest.clear()
+
+def _admin_requested(scope) -> bool:
+    wanted = False
+    token = None
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            wanted = value not in (b"", b"0", b"false")
+        elif name == b"authorization" and value[:7].lower() == b"bearer ":
+            token = value[7:].decode("latin-1")
+    if not wanted or not token:
+        return False
+    token_data = verify_token(token)
+    return token_data is not None and token_data.role == "admin"
+
+class ProfilerMiddleware:
+
+    def __init__(self, app, profiler: Profiler, always=False):
+        self.app = app
+        self.profiler = profiler
+        self.always = always
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (self.always or _admin_requested(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.profiler.start(scope["method"], scope["path"])
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append(PROFILE_ID_HEADER, str(profile.id))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.profiler.finish(profile, status)
+
+profiler = Profiler(settings.profile_interval_ms, settings.profile_keep)
@@ -1,44 +1,147 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from sqlalchemy.exc import IntegrityError
 
 from sqlalchemy.orm import Session
 
-from ..database import get_db
+from ..database import get_read_session, get_session, run_db
 
 from ..models.user import User, AcademicRecord
 
 from ..routers.auth import get_current_active_user, role_required
 
-from typing import List
+from ..mongo import async_activities_collection as activities_collection
+
+from ..utils import portfolio
+
+from ..utils.principal_cache import Principal
+
+from typing import List, Optional
 
-from ..schemas.user import AcademicRecord as AcademicRecordSchema
+from ..utils.pagination import (
+    ASCENDING, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER,
+    decode_cursor, encode_cursor, parse_fields, sort_direction,
+)
+
+from ..schemas.user import AcademicRecord as AcademicRecordSchema, AcademicRecordBatch
 
 router = APIRouter()
 
-@router.get("/academic-records/", response_model=List[AcademicRecordSchema])
+def records_for_user(db: Session, user_id: int):
 
-def get_academic_records(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+    return db.query(AcademicRecord).filter(AcademicRecord.user_id == user_id).all()
 
-    records = db.query(AcademicRecord).filter(AcademicRecord.user_id == current_user.id).all()
+def _write_records(db: Session, items):
 
-    return records
+    user_ids = {user_id for user_id, _ in items}
 
-@router.post("/academic-records/", response_model=AcademicRecordSchema)
+    semesters = {fields["semester"] for _, fields in items}
 
-def create_academic_record(record: AcademicRecordSchema, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+    existing = {
+        (r.user_id, r.semester): r
+        for r in db.query(AcademicRecord).filter(
+            AcademicRecord.user_id.in_(user_ids),
+            AcademicRecord.semester.in_(semesters)
+        )
+    }
 
-    db_record = AcademicRecord(**record.dict(), user_id=current_user.id)
+    records = []
 
-    db.add(db_record)
+    created = updated = 0
+
+    for user_id, fields in items:
+        record = existing.get((user_id, fields["semester"]))
+        if record:
+            for key, value in fields.items():
+                setattr(record, key, value)
+            updated += 1
+        else:
+            record = AcademicRecord(**fields, user_id=user_id)
+            db.add(record)
+            existing[(user_id, fields["semester"])] = record
+            created += 1
+        records.append(record)
 
     db.commit()
 
-    db.refresh(db_record)
+    return records, created, updated
+
+def upsert_records(db: Session, items):
+    """Upsert ``[(user_id, fields)]`` on (user_id, semester) in one transaction."""
+
+    try:
+
+        return _write_records(db, items)
+
+    except IntegrityError:
+
+        # A concurrent writer inserted one of these semesters first; the
+        # unique index rejected ours, and the retry updates theirs
+        db.rollback()
+
+        return _write_records(db, items)
+
+def save_record(db: Session, user_id: int, fields: dict):
+
+    records, _, _ = upsert_records(db, [(user_id, fields)])
+
+    db.refresh(records[0])
+
+    portfolio.refresh_academic(db, [user_id])
+
+    return records[0]
+
+def student_by_id(db: Session, student_id: int):
+
+    return db.query(User).filter(User.id == student_id, User.role == "student").first()
+
+STUDENT_FIELDS = ["id", "full_name", "email", "department"]
+
+def department_students(db: Session, department: str, year=None, fields=STUDENT_FIELDS, after_id=None, direction=ASCENDING, limit=None):
+
+    query = db.query(*[getattr(User, f) for f in fields]).filter(
+        User.role == "student", 
+        User.department == department
+    )
+
+    # Filter by Year (if Faculty is assigned to a specific year)
+    if year:
+        query = query.filter(User.year == year)
+
+    # Keyset pagination on the primary key
+    if after_id is not None:
+        query = query.filter(User.id > after_id if direction == ASCENDING else User.id < after_id)
 
-    return db_record
+    query = query.order_by(User.id.asc() if direction == ASCENDING else User.id.desc())
+
+    if limit:
+        query = query.limit(limit)
+
+    return [dict(zip(fields, row)) for row in query.all()]
+
+@router.get("/academic-records/", response_model=List[AcademicRecordSchema])
+
+async def get_academic_records(db: Session = Depends(get_read_session), current_user: Principal = Depends(get_current_active_user)):
+
+    return await run_db(db, records_for_user, current_user.id)
+
+@router.post("/academic-records/", response_model=AcademicRecordSchema)
+
+async def create_academic_record(record: AcademicRecordSchema, db: Session = Depends(get_session), current_user: Principal = Depends(get_current_active_user)):
+
+    return await run_db(db, save_record, current_user.id, record.dict())
 
 @router.get("/students/", response_model=List[dict])
 
-def get_students(db: Session = Depends(get_db), current_user: User = Depends(role_required("faculty"))):
+async def get_students(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: str = "asc",
+    fields: Optional[str] = None,
+    db: Session = Depends(get_read_session),
+    current_user: Principal = Depends(role_required("faculty"))
+):
     if not current_user.department:
         # If faculty has no department set, maybe return all? or none? 
         # Safer to return none or all matching "General"
@@ -46,28 +149,30 @@ def get_students(db: Session = Depends(get_db), current_user: User = Depends(rol
         # Let's assume strict department matching.
         return []
 
-    query = db.query(User).filter(
-        User.role == "student", 
-        User.department == current_user.department
-    )
+    direction = sort_direction(order)
+    columns = parse_fields(fields, STUDENT_FIELDS + ["year"], required=("id",)) or STUDENT_FIELDS
+    after_id = decode_cursor(cursor, [int])[0] if cursor else None
 
-    # 2. Filter by Year (if Faculty is assigned to a specific year)
-    if current_user.year:
-        query = query.filter(User.year == current_user.year)
+    students = await run_db(
+        db, department_students, current_user.department, current_user.year,
+        columns, after_id, direction, limit + 1
+    )
 
-    students = query.all()
+    if len(students) > limit:
+        students = students[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([students[-1]["id"]])
 
-    return [{"id": s.id, "full_name": s.full_name, "email": s.email, "department": s.department} for s in students]
+    return students
 
 @router.post("/student/{student_id}/record", response_model=AcademicRecordSchema)
-def add_student_academic_record(
+async def add_student_academic_record(
     student_id: int, 
     record: AcademicRecordSchema, 
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(role_required("faculty"))
+    db: Session = Depends(get_session), 
+    current_user: Principal = Depends(role_required("faculty"))
 ):
     # Verify student exists
-    student = db.query(User).filter(User.id == student_id, User.role == "student").first()
+    student = await run_db(db, student_by_id, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
         
@@ -75,8 +180,73 @@ def add_student_academic_record(
     if current_user.department and current_user.department != student.department:
         raise HTTPException(status_code=403, detail="Faculty can only update records for their department")
 
-    db_record = AcademicRecord(**record.dict(), user_id=student_id)
-    db.add(db_record)
-    db.commit()
-    db.refresh(db_record)
-    return db_record
+    return await run_db(db, save_record, student_id, record.dict())
+
+def upsert_student_records(db: Session, batch: AcademicRecordBatch, department):
+    student_ids = {item.student_id for item in batch.records}
+
+    # One query for every student in the batch, one for their existing records
+    students = {
+        s.id: s for s in db.query(User).filter(User.id.in_(student_ids), User.role == "student")
+    }
+
+    errors = []
+    for index, item in enumerate(batch.records):
+        student = students.get(item.student_id)
+        if not student:
+            errors.append({"index": index, "student_id": item.student_id, "error": "Student not found"})
+        elif department and department != student.department:
+            errors.append({"index": index, "student_id": item.student_id, "error": "Student is not in your department"})
+    if errors:
+        return None, errors
+
+    _, created, updated = upsert_records(
+        db, [(item.student_id, item.dict(exclude={"student_id"})) for item in batch.records]
+    )
+    portfolio.refresh_academic(db, student_ids)
+    return {"created": created, "updated": updated}, None
+
+@router.post("/records/bulk")
+async def bulk_upsert_academic_records(
+    batch: AcademicRecordBatch,
+    db: Session = Depends(get_session),
+    current_user: Principal = Depends(role_required("faculty"))
+):
+    # All-or-nothing: the batch is validated against the preloaded students
+    # and written in a single transaction, upserting on (student, semester)
+    result, errors = await run_db(db, upsert_student_records, batch, current_user.department)
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+    return result
+
+async def load_portfolio(db: Session, student_id: int):
+    summary = await run_db(db, portfolio.get_summary, student_id)
+    if summary is None:
+        # First read for this student: build the read model from scratch.
+        # The row is locked first so approvals during the read aren't lost.
+        await run_db(db, portfolio.lock_summary, student_id)
+        approved = await activities_collection.find(
+            {"user_id": student_id, "status": "approved"}, ["category", "skills_gained"]
+        ).to_list(None)
+        summary = await run_db(db, portfolio.rebuild_summary, student_id, approved)
+    return portfolio.summary_response(summary)
+
+@router.get("/portfolio")
+async def get_my_portfolio(db: Session = Depends(get_session), current_user: Principal = Depends(get_current_active_user)):
+
+    return await load_portfolio(db, current_user.id)
+
+@router.get("/portfolio/{student_id}")
+async def get_student_portfolio(
+    student_id: int,
+    db: Session = Depends(get_session),
+    current_user: Principal = Depends(role_required("faculty"))
+):
+    student = await run_db(db, student_by_id, student_id)
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    if current_user.department and current_user.department != student.department:
+        raise HTTPException(status_code=403, detail="Faculty can only view students in their department")
+
+    return await load_portfolio(db, student_id)
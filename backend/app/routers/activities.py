@@ -1,30 +1,118 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, Response
 
-from ..mongo import activities_collection
+from fastapi.encoders import jsonable_encoder
 
-from ..schemas.activity import ActivityCreate, Activity
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from ..mongo import async_activities_collection as activities_collection
+
+from ..mongo import activities_collection as sync_activities_collection
+
+from ..schemas.activity import ActivityCreate, Activity, ActivityModeration, ActivitySearchHit
 
 from ..routers.auth import get_current_active_user, role_required
 
-from ..models.user import User
+from ..utils.principal_cache import Principal
+
+from ..database import get_session, run_db
+
+from ..utils import stats
+
+from ..utils import portfolio
+
+from ..utils import skills
+
+from ..utils.uploads import UploadTooLarge, store_upload, upload_url
+
+from ..routers.proofs import proof_viewer, record_proof_owner
+
+from ..utils.events import event_bus, format_sse
+
+from ..utils.previews import PREVIEW_EXTENSIONS, preview_pipeline, preview_url
+
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+
+from ..utils.pagination import (
+    ASCENDING, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER,
+    decode_cursor, encode_cursor, keyset_filter, parse_fields, sort_direction,
+)
+
+from sqlalchemy.orm import Session
 
 from bson import ObjectId
 
+from pymongo import ReturnDocument
+
 from datetime import datetime
 
-from typing import List
+from typing import List, Optional
 
-import os
+import uuid
+
+from bson.errors import InvalidId
 
 router = APIRouter()
 
-UPLOAD_DIR = "uploads"
+# Keyset for listings (field -> type of its cursor value): newest/oldest
+# first, ties broken by _id
+PAGE_KEYS = {"created_at": datetime, "_id": ObjectId}
+
+ACTIVITY_FIELDS = set(Activity.model_fields)
+
+def store_thumbnail(source: str, preview: str):
+    # Runs on the preview pipeline's callback thread once a preview exists.
+    # Content files have no extension on disk, but proof URLs do, and the
+    # same bytes may have been uploaded under several of them.
+    base = upload_url(source)
+    sync_activities_collection.update_many(
+        {"proof_url": {"$in": [base] + [base + ext for ext in sorted(PREVIEW_EXTENSIONS)]}},
+        {"$set": {"thumbnail_url": upload_url(preview)}},
+    )
+
+preview_pipeline.on_ready(store_thumbnail)
+
+async def list_activities(query: dict, response: Response, limit: int, cursor: Optional[str], order: str, fields: Optional[str]):
+
+    direction = sort_direction(order)
+
+    fields = parse_fields(fields, ACTIVITY_FIELDS, required=("id", "created_at"))
+
+    projection = None if fields is None else ["_id" if f == "id" else f for f in fields]
+
+    query = keyset_filter(query, PAGE_KEYS, cursor, direction)
+
+    activities = await activities_collection.find(query, projection).sort(
+        [(key, direction) for key in PAGE_KEYS]
+    ).limit(limit + 1).to_list(None)
+
+    headers = {}
+
+    if len(activities) > limit:
+
+        activities = activities[:limit]
+
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(activities[-1][key] for key in PAGE_KEYS)
+
+    for activity in activities:
+
+        activity["id"] = str(activity["_id"])
+
+        del activity["_id"]
+
+    if fields is not None:
+
+        # Partial documents don't fit the Activity model
+        return JSONResponse(jsonable_encoder(activities), headers=headers)
 
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+    response.headers.update(headers)
+
+    return [Activity(**activity) for activity in activities]
 
 @router.post("/", response_model=Activity)
 
-def create_activity(activity: ActivityCreate, current_user: User = Depends(get_current_active_user)):
+async def create_activity(activity: ActivityCreate, db: Session = Depends(get_session), current_user: Principal = Depends(get_current_active_user)):
 
     activity_dict = activity.dict()
 
@@ -32,117 +120,350 @@ def create_activity(activity: ActivityCreate, current_user: User = Depends(get_c
 
     activity_dict["status"] = "pending"
 
-    activity_dict["created_at"] = datetime.utcnow()
+    # Denormalized so the faculty queue is a single indexed query; kept
+    # in sync by update_profile. Only student activities go to a queue.
+    is_student = current_user.role == "student"
+
+    activity_dict["department"] = current_user.department if is_student else None
+
+    activity_dict["year"] = current_user.year if is_student else None
+
+    # MongoDB stores milliseconds; truncate so every store (and the
+    # pagination cursors) agree on the exact value
+    now = datetime.utcnow()
+
+    activity_dict["created_at"] = now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+    proof_url = activity_dict.get("proof_url")
+
+    activity_dict["thumbnail_url"] = await run_in_threadpool(preview_url, proof_url) if proof_url else None
 
-    result = activities_collection.insert_one(activity_dict)
+    result = await activities_collection.insert_one(activity_dict)
+
+    if proof_url and not activity_dict["thumbnail_url"]:
+
+        # The preview may have finished between the check and the insert,
+        # before store_thumbnail could see this activity
+        activity_dict["thumbnail_url"] = await run_in_threadpool(preview_url, proof_url)
+
+        if activity_dict["thumbnail_url"]:
+
+            await activities_collection.update_one(
+                {"_id": result.inserted_id}, {"$set": {"thumbnail_url": activity_dict["thumbnail_url"]}}
+            )
+
+    await run_db(db, stats.record_activity_created, activity_dict, current_user.department)
 
     activity_dict["id"] = str(result.inserted_id)
 
+    event_bus.publish("created", activity_dict)
+
     return Activity(**activity_dict)
 
 @router.get("/", response_model=List[Activity])
 
-def get_activities(current_user: User = Depends(get_current_active_user)):
+async def get_activities(
 
-    activities = list(activities_collection.find({"user_id": current_user.id}))
+    response: Response,
 
-    for activity in activities:
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
 
-        activity["id"] = str(activity["_id"])
+    cursor: Optional[str] = None,
 
-        del activity["_id"]
+    order: str = "desc",
 
-    return [Activity(**activity) for activity in activities]
+    fields: Optional[str] = None,
 
-from ..database import get_db
-from sqlalchemy.orm import Session
+    current_user: Principal = Depends(get_current_active_user)
+
+):
+
+    return await list_activities({"user_id": current_user.id}, response, limit, cursor, order, fields)
 
 @router.get("/pending", response_model=List[Activity])
-def get_pending_activities(
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(role_required("faculty"))
+async def get_pending_activities(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: str = "asc",
+    fields: Optional[str] = None,
+    current_user: Principal = Depends(role_required("faculty"))
 ):
     if not current_user.department:
         return []
 
-    # 1. Get all student IDs belonging to this faculty's department
-    # 1. Get all student IDs belonging to this faculty's department AND year
-    query = db.query(User.id).filter(
-        User.role == "student",
-        User.department == current_user.department
-    )
+    # Pending activities of this faculty's department (and year, if the
+    # faculty is assigned one), oldest first by default. Served by the
+    # (status, department, year, created_at) index.
+    query = {"status": "pending", "department": current_user.department}
 
     if current_user.year:
-        query = query.filter(User.year == current_user.year)
+        query["year"] = current_user.year
 
-    department_students = query.all()
-    
-    # department_students is a list of tuples like [(1,), (2,)]
-    student_ids = [s[0] for s in department_students]
+    return await list_activities(query, response, limit, cursor, order, fields)
 
-    if not student_ids:
-        return []
+@router.get("/events")
+async def activity_events(current_user: Principal = Depends(proof_viewer)):
 
-    # 2. Query MongoDB for pending activities belonging to these students
-    activities = list(activities_collection.find({
-        "status": "pending",
-        "user_id": {"$in": student_ids}
-    }))
+    # Server-sent events for the faculty queue: created/approved/rejected
+    # activities of the faculty's department (and year). EventSource can't
+    # send headers, so the token may come as ?token= like proof links.
+    if current_user.role != "faculty":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    for activity in activities:
-        activity["id"] = str(activity["_id"])
-        del activity["_id"]
+    if not current_user.department:
+        raise HTTPException(status_code=403, detail="Faculty has no department assigned")
+
+    async def stream():
+        subscription = event_bus.subscribe(current_user.department, current_user.year)
+        try:
+            # Reconnect delay for the browser, in milliseconds
+            yield "retry: 3000\n\n"
+            while True:
+                event = await subscription.get(settings.event_heartbeat_seconds)
+                # A comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n" if event is None else format_sse(event)
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"},
+    )
 
-    return [Activity(**activity) for activity in activities]
+@router.get("/search", response_model=List[ActivitySearchHit])
+async def search_activities(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    department: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(role_required("faculty", "admin"))
+):
+    # Faculty search their own department (none without one, as in the
+    # pending queue); admins search everything
+    if current_user.role == "faculty":
+        if not current_user.department:
+            return []
+        if department and department != current_user.department:
+            raise HTTPException(status_code=403, detail="Faculty can only search their department")
+        department = current_user.department
 
-@router.put("/{activity_id}/approve")
+    # Served by the title/description text index: MongoDB's own, or the
+    # fallback store's BM25 index (app/textindex.py)
+    query = {"$text": {"$search": q}}
 
-def approve_activity(activity_id: str, current_user: User = Depends(role_required("faculty"))):
+    for field, value in (("status", status), ("category", category), ("department", department)):
+        if value:
+            query[field] = value
 
-    activity = activities_collection.find_one({"_id": ObjectId(activity_id)})
+    # Results are ranked, so the cursor is a position in the ranking
+    offset = decode_cursor(cursor, [int])[0] if cursor else 0
 
-    if not activity:
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    hits = await activities_collection.find(
+        query, {"score": {"$meta": "textScore"}}
+    ).sort(
+        [("score", {"$meta": "textScore"}), ("_id", ASCENDING)]
+    ).skip(offset).limit(limit + 1).to_list(None)
+
+    if len(hits) > limit:
+
+        hits = hits[:limit]
 
-        raise HTTPException(status_code=404, detail="Activity not found")
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([offset + limit])
 
-    activities_collection.update_one(
+    for hit in hits:
 
-        {"_id": ObjectId(activity_id)},
+        hit["id"] = str(hit.pop("_id"))
 
-        {"$set": {"status": "approved", "approved_at": datetime.utcnow(), "faculty_id": current_user.id}}
+    return [ActivitySearchHit(**hit) for hit in hits]
 
+async def decide_activity(activity_id: str, status: str, db: Session, current_user: Principal):
+
+    # Transition and read the previous state in one step, so concurrent
+    # decisions on the same activity can't both apply their deltas
+    activity = await activities_collection.find_one_and_update(
+
+        {"_id": ObjectId(activity_id), "status": {"$ne": status}, "user_id": {"$ne": current_user.id}},
+
+        {"$set": {"status": status, "approved_at": datetime.utcnow(), "faculty_id": current_user.id}},
+
+        return_document=ReturnDocument.BEFORE,
     )
 
+    if not activity:
+
+        existing = await activities_collection.find_one({"_id": ObjectId(activity_id)}, ["user_id"])
+
+        if not existing:
+
+            raise HTTPException(status_code=404, detail="Activity not found")
+
+        if existing.get("user_id") == current_user.id:
+
+            raise HTTPException(status_code=403, detail="You cannot review your own activity")
+
+        # Already in that status
+        return
+
+    await run_db(db, stats.record_status_change, activity.get("status"), status)
+
+    await run_db(db, portfolio.record_activity_status, [activity], activity.get("status"), status)
+
+    await run_db(db, skills.record_activity_status, [activity], activity.get("status"), status)
+
+    event_bus.publish(status, dict(activity, status=status))
+
+@router.put("/{activity_id}/approve")
+
+async def approve_activity(activity_id: str, db: Session = Depends(get_session), current_user: Principal = Depends(role_required("faculty"))):
+
+    await decide_activity(activity_id, "approved", db, current_user)
+
     return {"message": "Activity approved"}
 
 @router.put("/{activity_id}/reject")
 
-def reject_activity(activity_id: str, current_user: User = Depends(role_required("faculty"))):
+async def reject_activity(activity_id: str, db: Session = Depends(get_session), current_user: Principal = Depends(role_required("faculty"))):
 
-    activity = activities_collection.find_one({"_id": ObjectId(activity_id)})
+    await decide_activity(activity_id, "rejected", db, current_user)
 
-    if not activity:
+    return {"message": "Activity rejected"}
+
+@router.post("/moderate")
+
+async def moderate_activities(batch: ActivityModeration, db: Session = Depends(get_session), current_user: Principal = Depends(role_required("faculty"))):
+
+    # Faculty moderate their own department (and year), like the queue
+    if not current_user.department:
+
+        return {"updated": 0, "results": {}}
+
+    status = "approved" if batch.decision == "approve" else "rejected"
+
+    results = {}
 
-        raise HTTPException(status_code=404, detail="Activity not found")
+    object_ids = []
+
+    for activity_id in dict.fromkeys(batch.ids):
+
+        try:
+
+            object_ids.append(ObjectId(activity_id))
+
+        except (InvalidId, TypeError):
+
+            results[activity_id] = "invalid id"
+
+    # One update for the whole batch. Filtering on status=pending makes
+    # concurrent moderators race safely: each activity is decided once.
+    # The batch tag lets us tell our writes apart when reading back.
+    batch_id = uuid.uuid4().hex
+
+    scope = {"department": current_user.department}
+
+    if current_user.year:
 
-    activities_collection.update_one(
+        scope["year"] = current_user.year
 
-        {"_id": ObjectId(activity_id)},
+    result = await activities_collection.update_many(
 
-        {"$set": {"status": "rejected", "approved_at": datetime.utcnow(), "faculty_id": current_user.id}}
+        {"_id": {"$in": object_ids}, "status": "pending", "user_id": {"$ne": current_user.id}, **scope},
+
+        {"$set": {"status": status, "approved_at": datetime.utcnow(), "faculty_id": current_user.id, "moderation_batch": batch_id}}
 
     )
 
-    return {"message": "Activity rejected"}
+    current = await activities_collection.find(
+
+        {"_id": {"$in": object_ids}}, ["status", "moderation_batch", "user_id", "department", "year", "category", "title", "skills_gained"]
+
+    ).to_list(None)
+
+    if result.modified_count:
+
+        # The tag has served its purpose; don't leave it on the documents
+        await activities_collection.update_many(
+
+            {"_id": {"$in": object_ids}, "moderation_batch": batch_id},
+
+            {"$unset": {"moderation_batch": ""}}
+
+        )
+
+    # Activities outside the faculty's scope are reported as missing
+    found = {str(doc["_id"]): doc for doc in current if all(doc.get(field) == value for field, value in scope.items())}
+
+    tagged = {doc["_id"] for doc in current if doc.pop("moderation_batch", None) == batch_id}
+
+    decided = [doc for doc in current if doc["_id"] in tagged]
+
+    for oid in object_ids:
+
+        doc = found.get(str(oid))
+
+        if doc is None:
+
+            results[str(oid)] = "not found"
+
+        elif oid in tagged:
+
+            results[str(oid)] = status
+
+        elif doc.get("user_id") == current_user.id:
+
+            results[str(oid)] = "own activity"
+
+        else:
+
+            results[str(oid)] = f"already {doc.get('status')}"
+
+    await run_db(db, stats.record_status_change, "pending", status, result.modified_count)
+
+    await run_db(db, portfolio.record_activity_status, decided, "pending", status)
+
+    await run_db(db, skills.record_activity_status, decided, "pending", status)
+
+    for doc in decided:
+
+        event_bus.publish(status, doc)
+
+    return {"updated": result.modified_count, "results": results}
 
 @router.post("/upload-proof")
 
-def upload_proof(file: UploadFile = File(...), current_user: User = Depends(get_current_active_user)):
+async def upload_proof(request: Request, file: UploadFile = File(...), db: Session = Depends(get_session), current_user: Principal = Depends(get_current_active_user)):
+
+    try:
+
+        declared_length = int(request.headers.get("content-length") or 0)
+
+    except ValueError:
+
+        raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+
+    # Cheap early rejection; the limit is enforced again while streaming
+    if declared_length > settings.max_upload_bytes + 64 * 1024:
+
+        raise HTTPException(status_code=413, detail="File too large")
+
+    try:
+
+        stored = await store_upload(file)
+
+    except UploadTooLarge:
 
-    file_path = os.path.join(UPLOAD_DIR, f"{current_user.id}_{file.filename}")
+        raise HTTPException(status_code=413, detail="File too large")
 
-    with open(file_path, "wb") as f:
+    await run_db(db, record_proof_owner, stored.sha256, current_user.id, stored.size)
 
-        f.write(file.file.read())
+    # Thumbnail/first-page preview is generated in the background
+    preview_pipeline.submit(stored.path, stored.extension)
 
-    return {"url": file_path}
\ No newline at end of file
+    return {"url": stored.url, "sha256": stored.sha256, "size": stored.size, "media_type": stored.media_type}
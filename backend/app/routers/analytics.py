@@ -2,50 +2,31 @@ from fastapi import APIRouter, Depends
 
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-
-from ..models.user import User, AcademicRecord
+from ..database import get_db, get_read_db
 
 from ..routers.auth import role_required
 
+from ..utils.principal_cache import Principal
+
 from ..mongo import activities_collection
 
-from typing import Dict
+from ..utils import stats
 
 router = APIRouter()
 
 @router.get("/")
 def get_analytics(
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(role_required("admin"))
+    db: Session = Depends(get_read_db),
+    write_db: Session = Depends(get_db),
+    current_user: Principal = Depends(role_required("admin"))
 ):
-    # Total students
-    total_students = db.query(User).filter(User.role == "student").count()
-
-    # Total activities
-
-    total_activities = activities_collection.count_documents({})
-
-    # Department-wise activities
-
-    department_wise = {}
-
-    activities = list(activities_collection.find({}))
-
-    for activity in activities:
+    # Served from the materialized counters; see utils/stats.py
+    return stats.read_counters(db, activities_collection, write_db)
 
-        user = db.query(User).filter(User.id == activity["user_id"]).first()
-
-        if user and user.department:
-
-            department_wise[user.department] = department_wise.get(user.department, 0) + 1
-
-    return {
-
-        "total_students": total_students,
-
-        "total_activities": total_activities,
-
-        "department_wise": department_wise
-
-    }
+@router.post("/rebuild")
+def rebuild_analytics(
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(role_required("admin"))
+):
+    stats.rebuild_counters(db, activities_collection)
+    return stats.read_counters(db, activities_collection)
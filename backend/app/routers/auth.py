@@ -1,22 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
 
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
 from sqlalchemy.orm import Session
 
-from ..database import get_db
+from typing import Optional
+
+import io
+
+from ..database import get_session, run_db
 
 from ..models.user import User
 
+from ..mongo import async_activities_collection as activities_collection
+
 from ..schemas.user import UserCreate, User as UserSchema, Token, TokenData
 
-from ..utils.auth import verify_password, get_password_hash, create_access_token, verify_token
+from ..utils import stats
+
+from ..utils import skills
+
+from ..utils.principal_cache import Principal, principal_cache
+
+from ..utils.bulk_import import import_students, guess_format
+
+from ..utils.auth import HashingBusy, password_hasher, create_access_token, verify_token
 
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def user_by_email(db: Session, email: str):
+
+    return db.query(User).filter(User.email == email).first()
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_session)):
 
     credentials_exception = HTTPException(
 
@@ -34,15 +52,25 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
 
         raise credentials_exception
 
-    user = db.query(User).filter(User.email == token_data.email).first()
+    principal = principal_cache.get(token_data.email)
+
+    if principal is not None:
+
+        return principal
+
+    user = await run_db(db, user_by_email, token_data.email)
 
     if user is None:
 
         raise credentials_exception
 
-    return user
+    principal = Principal.from_user(user)
+
+    principal_cache.put(token_data.email, principal)
 
-def get_current_active_user(current_user: User = Depends(get_current_user)):
+    return principal
+
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)):
 
     if not current_user.is_active:
 
@@ -50,11 +78,11 @@ def get_current_active_user(current_user: User = Depends(get_current_user)):
 
     return current_user
 
-def role_required(required_role: str):
+def role_required(*roles: str):
 
-    def role_checker(current_user: User = Depends(get_current_active_user)):
+    async def role_checker(current_user: Principal = Depends(get_current_active_user)):
 
-        if current_user.role != required_role:
+        if current_user.role not in roles:
 
             raise HTTPException(status_code=403, detail="Not enough permissions")
 
@@ -62,17 +90,47 @@ def role_required(required_role: str):
 
     return role_checker
 
+def hashing_busy_exception():
+
+    return HTTPException(
+
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+
+        detail="Too many authentication requests, please retry shortly",
+
+        headers={"Retry-After": "1"},
+
+    )
+
+def save_new_user(db: Session, db_user: User):
+
+    db.add(db_user)
+
+    if db_user.role == "student":
+
+        stats.record_student_registered(db)
+
+    db.commit()
+
+    db.refresh(db_user)
+
 @router.post("/register", response_model=UserSchema)
 
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: Session = Depends(get_session)):
 
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await run_db(db, user_by_email, user.email)
 
     if db_user:
 
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(user.password)
+    try:
+
+        hashed_password = await password_hasher.hash(user.password)
+
+    except HashingBusy:
+
+        raise hashing_busy_exception()
 
     db_user = User(
 
@@ -90,45 +148,87 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 
     )
 
-    db.add(db_user)
+    await run_db(db, save_new_user, db_user)
 
-    db.commit()
+    return db_user
 
-    db.refresh(db_user)
+@router.post("/bulk-import")
 
-    return db_user
+async def bulk_import(
+
+    file: UploadFile = File(...),
+
+    format: Optional[str] = None,
+
+    db: Session = Depends(get_session),
+
+    current_user: Principal = Depends(role_required("admin"))
+
+):
+
+    fmt = format or guess_format(file.filename)
+
+    if fmt not in ("csv", "jsonl"):
+
+        raise HTTPException(status_code=400, detail="format must be csv or jsonl")
+
+    lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+
+    try:
+
+        return await import_students(db, lines, fmt)
+
+    except UnicodeDecodeError:
+
+        raise HTTPException(status_code=400, detail="Import file must be UTF-8 text")
+
+    except HashingBusy:
+
+        raise hashing_busy_exception()
 
 @router.post("/token", response_model=Token)
 
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_session)):
+
+    user = await run_db(db, user_by_email, form_data.username)
+
+    if not user:
+
+        raise HTTPException(status_code=400, detail="Incorrect email or password")
+
+    try:
+
+        verified, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+
+    except HashingBusy:
 
-    user = db.query(User).filter(User.email == form_data.username).first()
+        raise hashing_busy_exception()
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not verified:
 
         raise HTTPException(status_code=400, detail="Incorrect email or password")
 
+    if new_hash:
+
+        # Hash parameters changed since this password was stored
+
+        await run_db(db, apply_profile_update, user.id, {"hashed_password": new_hash})
+
     access_token = create_access_token(data={"sub": user.email, "role": user.role})
 
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserSchema)
-def read_users_me(current_user: User = Depends(get_current_active_user)):
+async def read_users_me(current_user: Principal = Depends(get_current_active_user)):
     return current_user
 
 from ..schemas.user import UserUpdate
 
-@router.put("/profile", response_model=UserSchema)
-def update_profile(
-    profile_update: UserUpdate, 
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_active_user)
-):
-    user = db.query(User).filter(User.id == current_user.id).first()
+def apply_profile_update(db: Session, user_id: int, update_data: dict):
+    user = db.query(User).filter(User.id == user_id).first()
     if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+        return None
     
-    update_data = profile_update.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(user, key, value)
     
@@ -136,3 +236,45 @@ def update_profile(
     db.commit()
     db.refresh(user)
     return user
+
+@router.put("/profile", response_model=UserSchema)
+async def update_profile(
+    profile_update: UserUpdate, 
+    db: Session = Depends(get_session), 
+    current_user: Principal = Depends(get_current_active_user)
+):
+    user = await run_db(db, apply_profile_update, current_user.id, profile_update.dict(exclude_unset=True))
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    principal_cache.invalidate(user.email)
+
+    # Keep the department/year copies on the user's activities in step
+    # (only student activities carry them)
+    if (user.department, user.year) != (current_user.department, current_user.year):
+        if user.role == "student":
+            await activities_collection.update_many(
+                {"user_id": user.id},
+                {"$set": {"department": user.department, "year": user.year}}
+            )
+            await run_db(db, skills.move_student, user.id, user.department, user.year)
+        if user.department != current_user.department:
+            moved = await activities_collection.count_documents({"user_id": user.id})
+            await run_db(db, stats.record_department_change, current_user.department, user.department, moved)
+
+    return user
+
+@router.put("/users/{user_id}/deactivate", response_model=UserSchema)
+async def deactivate_user(
+    user_id: int,
+    db: Session = Depends(get_session),
+    current_user: Principal = Depends(role_required("admin"))
+):
+    user = await run_db(db, apply_profile_update, user_id, {"is_active": False})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    principal_cache.invalidate(user.email)
+    return user
+
+@router.get("/principal-cache")
+async def principal_cache_stats(current_user: Principal = Depends(role_required("admin"))):
+    return principal_cache.stats()
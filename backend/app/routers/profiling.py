@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from fastapi.responses import PlainTextResponse
+
+from ..profiling import profiler
+
+from ..routers.auth import role_required
+
+from ..utils.principal_cache import Principal
+
+router = APIRouter()
+
+@router.get("/")
+def list_profiles(current_user: Principal = Depends(role_required("admin"))):
+    # Slowest first
+    return profiler.profiles()
+
+@router.get("/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: int, current_user: Principal = Depends(role_required("admin"))):
+    profile = profiler.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    # Collapsed stacks, ready for flamegraph.pl or speedscope
+    return PlainTextResponse(profile.collapsed())
+
+@router.delete("/")
+def clear_profiles(current_user: Principal = Depends(role_required("admin"))):
+    profiler.clear()
+    return {"message": "Profiles cleared"}
@@ -0,0 +1,119 @@
+import os
+import re
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import open_session, run_db
+from ..models.proof import ProofUpload
+from ..routers.auth import get_current_user
+from ..utils.principal_cache import Principal
+from ..utils.uploads import media_type
+
+router = APIRouter()
+
+CONTENT_NAME = re.compile(r"(?P<sha256>[0-9a-f]{64})(?P<thumb>\.thumb\.jpg)?(\.[a-z0-9]{1,10})?")
+
+# Content-addressed files never change, so clients may keep them forever;
+# "private" because access is per user
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+LEGACY_CACHE_CONTROL = "private, no-cache"
+
+def record_proof_owner(db: Session, sha256: str, user_id: int, size: int):
+    if db.get(ProofUpload, (sha256, user_id)):
+        return
+    db.add(ProofUpload(sha256=sha256, user_id=user_id, size=size))
+    try:
+        db.commit()
+    except IntegrityError:
+        # The same user uploaded the same file concurrently
+        db.rollback()
+
+def owns_proof(db: Session, sha256: str, user_id: int) -> bool:
+    return db.get(ProofUpload, (sha256, user_id)) is not None
+
+async def proof_viewer(request: Request, token: Optional[str] = None) -> Principal:
+    # Links opened straight from the dashboard can't set an Authorization
+    # header, so the bearer token may also come as ?token=
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    # Streamed downloads and SSE outlive the request's dependencies, so
+    # the lookup uses its own session, released before the body is sent
+    async with open_session() as db:
+        principal = await get_current_user(token, db)
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def _serve(request: Request, path: str, etag: str, cache_control: str, media_type: Optional[str] = None):
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    headers = {"etag": etag, "cache-control": cache_control}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    # FileResponse answers Range/If-Range requests and hands the file to
+    # the server via the ASGI pathsend extension (zero-copy) when available
+    return FileResponse(path, headers=headers, media_type=media_type)
+
+@router.get("/{prefix}/{name}")
+async def get_proof(
+    prefix: str,
+    name: str,
+    request: Request,
+    current_user: Principal = Depends(proof_viewer)
+):
+    match = CONTENT_NAME.fullmatch(name)
+    if not match or match["sha256"][:2] != prefix:
+        raise HTTPException(status_code=404, detail="File not found")
+    sha256 = match["sha256"]
+
+    if current_user.role not in ("faculty", "admin"):
+        async with open_session() as db:
+            owner = await run_db(db, owns_proof, sha256, current_user.id)
+        if not owner:
+            raise HTTPException(status_code=404, detail="File not found")
+
+    if match["thumb"]:
+        path = os.path.join(settings.upload_dir, prefix, name)
+        return _serve(request, path, f'"{sha256}-thumb"', IMMUTABLE_CACHE_CONTROL)
+
+    # Stored under the hash alone; the URL's extension gives the media type.
+    # Files stored before that kept the extension on disk.
+    path = os.path.join(settings.upload_dir, prefix, sha256)
+    if not os.path.isfile(path):
+        path = os.path.join(settings.upload_dir, prefix, name)
+    extension = os.path.splitext(name)[1]
+    return _serve(request, path, f'"{sha256}"', IMMUTABLE_CACHE_CONTROL, media_type(extension))
+
+@router.get("/{name}")
+async def get_legacy_proof(
+    name: str,
+    request: Request,
+    current_user: Principal = Depends(proof_viewer)
+):
+    # Files uploaded before content addressing were named {user_id}_{filename}
+    if name.startswith(".") or "/" in name or "\\" in name:
+        raise HTTPException(status_code=404, detail="File not found")
+    if current_user.role not in ("faculty", "admin") and not name.startswith(f"{current_user.id}_"):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    path = os.path.join(settings.upload_dir, name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    stat = os.stat(path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    return _serve(request, path, etag, LEGACY_CACHE_CONTROL)
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+
+from ..routers.auth import get_current_active_user, role_required
+
+from ..utils.principal_cache import Principal
+
+from ..mongo import activities_collection
+
+from ..utils import skills
+
+from typing import List, Optional
+
+router = APIRouter()
+
+@router.get("/autocomplete")
+def autocomplete_skills(
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    # Most used skills first
+    return skills.autocomplete(db, prefix, limit)
+
+@router.get("/search")
+def search_students_by_skill(
+    skill: List[str] = Query(..., description="Repeat for several skills"),
+    department: Optional[str] = None,
+    year: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(role_required("faculty", "admin"))
+):
+    # Faculty search within their own department (nothing without one);
+    # admins (placement cell) anywhere
+    if current_user.role == "faculty":
+        if not current_user.department:
+            return []
+        if department and department != current_user.department:
+            raise HTTPException(status_code=403, detail="Faculty can only search their department")
+        department = current_user.department
+
+    return skills.search_students(db, skill, department, year, limit, offset)
+
+@router.post("/rebuild")
+def rebuild_skill_index(
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(role_required("admin"))
+):
+    return {"skills": skills.rebuild_skill_index(db, activities_collection)}
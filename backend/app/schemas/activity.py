@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from datetime import datetime
 
@@ -34,4 +34,20 @@ class Activity(ActivityBase):
 
     approved_at: Optional[datetime] = None
 
-    faculty_id: Optional[int] = None
\ No newline at end of file
+    faculty_id: Optional[int] = None
+
+    department: Optional[str] = None
+
+    year: Optional[str] = None
+
+    thumbnail_url: Optional[str] = None
+
+class ActivitySearchHit(Activity):
+
+    score: float
+
+class ActivityModeration(BaseModel):
+
+    ids: List[str] = Field(..., min_length=1, max_length=500)
+
+    decision: Literal["approve", "reject"]
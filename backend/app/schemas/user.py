@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
-from typing import Optional
+from typing import List, Optional
 
 from datetime import datetime
 
@@ -57,3 +57,9 @@ class AcademicRecord(BaseModel):
 
     class Config:
         from_attributes = True
+
+class StudentAcademicRecord(AcademicRecord):
+    student_id: int
+
+class AcademicRecordBatch(BaseModel):
+    records: List[StudentAcademicRecord] = Field(..., min_length=1, max_length=1000)
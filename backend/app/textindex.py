@@ -0,0 +1,114 @@
+"""Inverted text index for the fallback stores.
+
+Gives ``MockCollection`` (and so ``FileCollection``) the part of MongoDB's
+text search the app relies on: a ``text`` index over one or more weighted
+fields, ``$text: {"$search": ...}`` queries and a ``textScore`` to rank
+by. Scores are BM25 over the weighted field terms rather than MongoDB's
+own formula, so the order of results can differ slightly between stores.
+
+Search strings follow MongoDB's syntax: terms are OR'ed, ``"quoted
+phrases"`` must all match, and ``-term`` excludes documents. Phrases are
+matched on their terms, not on word order. There is no stemming.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_TOKEN = re.compile(r"\w+")
+_PHRASE = re.compile(r'"([^"]*)"')
+
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or "
+    "that the this to was were will with".split()
+)
+
+def tokenize(text):
+    if not isinstance(text, str):
+        return []
+    return [token for token in _TOKEN.findall(text.casefold()) if token not in STOP_WORDS]
+
+def parse_search(search):
+    """Split a ``$search`` string into (terms, required phrases, excluded terms)."""
+    phrases = [tokenize(phrase) for phrase in _PHRASE.findall(search)]
+    rest = _PHRASE.sub(" ", search)
+    terms, excluded = [], []
+    for word in rest.split():
+        if word.startswith("-"):
+            excluded.extend(tokenize(word[1:]))
+        else:
+            terms.extend(tokenize(word))
+    for phrase in phrases:
+        terms.extend(phrase)
+    return list(dict.fromkeys(terms)), [p for p in phrases if p], set(excluded)
+
+class TextIndex:
+    """Per-term postings with weighted term frequencies, scored with BM25."""
+
+    def __init__(self, weights):
+        self.weights = dict(weights)
+        self.clear()
+
+    def clear(self):
+        self.postings = defaultdict(dict)  # term -> {key: weighted tf}
+        self.lengths = {}                  # key -> weighted document length
+        self.total_length = 0
+
+    def _terms(self, doc, get_path):
+        terms = Counter()
+        for field, weight in self.weights.items():
+            for token in tokenize(get_path(doc, field)):
+                terms[token] += weight
+        return terms
+
+    def add(self, key, doc, get_path):
+        terms = self._terms(doc, get_path)
+        if not terms:
+            return
+        for term, tf in terms.items():
+            self.postings[term][key] = tf
+        length = sum(terms.values())
+        self.lengths[key] = length
+        self.total_length += length
+
+    def remove(self, key, doc, get_path):
+        length = self.lengths.pop(key, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self._terms(doc, get_path):
+            bucket = self.postings.get(term)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self.postings[term]
+
+    def search(self, search):
+        """Return ``{key: score}`` for the documents matching ``search``."""
+        terms, phrases, excluded = parse_search(search)
+        if not terms or not self.lengths:
+            return {}
+        count = len(self.lengths)
+        average = self.total_length / count
+        scores = defaultdict(float)
+        for term in terms:
+            bucket = self.postings.get(term)
+            if not bucket:
+                continue
+            idf = math.log(1 + (count - len(bucket) + 0.5) / (len(bucket) + 0.5))
+            for key, tf in bucket.items():
+                norm = K1 * (1 - B + B * self.lengths[key] / average)
+                scores[key] += idf * tf * (K1 + 1) / (tf + norm)
+        for phrase in phrases:
+            for term in phrase:
+                bucket = self.postings.get(term, {})
+                for key in [key for key in scores if key not in bucket]:
+                    del scores[key]
+        for term in excluded:
+            for key in self.postings.get(term, ()):
+                scores.pop(key, None)
+        return dict(scores)
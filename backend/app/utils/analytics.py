@@ -0,0 +1,67 @@
+from collections import Counter
+
+from sqlalchemy.orm import Session
+
+from ..models.user import User
+
+# One grouped pass over the activities: every breakdown the admin dashboard
+# shows is rolled up from these (user, status, category, month) buckets.
+ACTIVITY_BREAKDOWN_PIPELINE = [
+    {
+        "$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "status": "$status",
+                "category": "$category",
+                "month": {"$dateToString": {"format": "%Y-%m", "date": "$created_at"}},
+            },
+            "count": {"$sum": 1},
+        }
+    }
+]
+
+# Keep IN (...) lists below SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 900
+
+def department_lookup(db: Session, user_ids):
+    user_ids = list(user_ids)
+    departments = {}
+    for start in range(0, len(user_ids), LOOKUP_CHUNK_SIZE):
+        chunk = user_ids[start:start + LOOKUP_CHUNK_SIZE]
+        rows = db.query(User.id, User.department).filter(User.id.in_(chunk)).all()
+        departments.update({user_id: department for user_id, department in rows})
+    return departments
+
+def summarize_activities(db: Session, collection):
+    groups = list(collection.aggregate(ACTIVITY_BREAKDOWN_PIPELINE))
+
+    departments = department_lookup(db, {group["_id"]["user_id"] for group in groups})
+
+    total = 0
+    department_wise = Counter()
+    status_wise = Counter()
+    category_wise = Counter()
+    monthly = Counter()
+
+    for group in groups:
+        key = group["_id"]
+        count = group["count"]
+        total += count
+
+        department = departments.get(key.get("user_id"))
+        if department:
+            department_wise[department] += count
+        if key.get("status"):
+            status_wise[key["status"]] += count
+        if key.get("category"):
+            category_wise[key["category"]] += count
+        if key.get("month"):
+            monthly[key["month"]] += count
+
+    return {
+        "total_activities": total,
+        "department_wise": dict(department_wise),
+        "status_wise": dict(status_wise),
+        "category_wise": dict(category_wise),
+        "monthly": dict(sorted(monthly.items())),
+    }
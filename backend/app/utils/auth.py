@@ -1,3 +1,11 @@
+import asyncio
+
+import multiprocessing
+
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+
 from datetime import datetime, timedelta
 
 from typing import Optional
@@ -10,7 +18,19 @@ from ..config import settings
 
 from ..schemas.user import TokenData
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+pwd_context = CryptContext(
+
+    schemes=["pbkdf2_sha256"],
+
+    deprecated="auto",
+
+    pbkdf2_sha256__default_rounds=settings.password_hash_rounds,
+
+    pbkdf2_sha256__min_rounds=settings.password_hash_rounds,
+
+    pbkdf2_sha256__max_rounds=settings.password_hash_rounds,
+
+)
 
 def verify_password(plain_password, hashed_password):
 
@@ -20,6 +40,138 @@ def get_password_hash(password):
 
     return pwd_context.hash(password)
 
+def hash_passwords(passwords):
+
+    return [pwd_context.hash(password) for password in passwords]
+
+def verify_and_update_password(plain_password, hashed_password):
+
+    # Returns (verified, new_hash); new_hash is set when the stored hash
+    # was made with different parameters than the current settings
+
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+class HashingBusy(Exception):
+
+    """Raised when too many password hashes are already queued."""
+
+class PasswordHasher:
+
+    """Runs password hashing in a bounded process pool.
+
+    pbkdf2 holds the GIL for the whole computation, so hashing in the
+    request thread stalls every other request during a login storm. Work
+    is sent to worker processes instead, and at most ``max_pending``
+    operations may be queued or running; beyond that callers get
+    HashingBusy immediately rather than piling up. With ``workers=0``
+    hashing runs on the threadpool instead.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+
+        self.workers = workers
+
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+        self._executor = None
+
+        self._stats_lock = threading.Lock()
+
+        self.in_flight = 0
+
+        self.completed = 0
+
+        self.rejected = 0
+
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+
+        with self._executor_lock:
+
+            if self._executor is None and self.workers > 0:
+
+                self._executor = ProcessPoolExecutor(
+
+                    max_workers=self.workers,
+
+                    mp_context=multiprocessing.get_context("spawn"),
+
+                )
+
+            return self._executor
+
+    async def _run(self, fn, *args):
+
+        if not self._slots.acquire(blocking=False):
+
+            with self._stats_lock:
+
+                self.rejected += 1
+
+            raise HashingBusy()
+
+        with self._stats_lock:
+
+            self.in_flight += 1
+
+        try:
+
+            loop = asyncio.get_running_loop()
+
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+
+        finally:
+
+            with self._stats_lock:
+
+                self.in_flight -= 1
+
+                self.completed += 1
+
+            self._slots.release()
+
+    async def hash(self, password):
+
+        return await self._run(get_password_hash, password)
+
+    async def hash_many(self, passwords):
+
+        # One chunk per worker, so a large batch takes a few queue slots
+        # rather than one per password
+
+        passwords = list(passwords)
+
+        size = max(1, -(-len(passwords) // max(self.workers, 1)))
+
+        chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+
+        results = await asyncio.gather(*(self._run(hash_passwords, chunk) for chunk in chunks))
+
+        return [hashed for chunk in results for hashed in chunk]
+
+    async def verify_and_update(self, plain_password, hashed_password):
+
+        return await self._run(verify_and_update_password, plain_password, hashed_password)
+
+    def stats(self):
+
+        with self._stats_lock:
+
+            return {"in_flight": self.in_flight, "completed": self.completed, "rejected": self.rejected}
+
+    def shutdown(self):
+
+        with self._executor_lock:
+
+            if self._executor is not None:
+
+                self._executor.shutdown(wait=False, cancel_futures=True)
+
+                self._executor = None
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_max_pending)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
     to_encode = data.copy()
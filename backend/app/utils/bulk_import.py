@@ -0,0 +1,131 @@
+import csv
+import json
+from itertools import islice
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..database import run_db
+from ..models.user import User
+from ..schemas.user import UserCreate
+from . import stats
+from .auth import password_hasher
+
+DEFAULT_BATCH_SIZE = 500
+
+def iter_rows(lines, fmt: str):
+    """Yield ``(row_number, dict)`` from CSV or JSON-lines text, lazily."""
+    if fmt == "csv":
+        for number, row in enumerate(csv.DictReader(lines), start=2):
+            yield number, {k.strip(): v for k, v in row.items() if k and v not in (None, "")}
+    elif fmt == "jsonl":
+        for number, line in enumerate(lines, start=1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError as e:
+                    yield number, e
+    else:
+        raise ValueError(f"Unsupported import format {fmt!r}")
+
+def guess_format(filename: str) -> str:
+    return "jsonl" if filename and filename.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+def existing_emails(db: Session, emails):
+    return {email for (email,) in db.query(User.email).filter(User.email.in_(emails))}
+
+def insert_users(db: Session, records):
+    """Insert a batch with one executemany; returns the emails that failed."""
+    try:
+        db.execute(insert(User), records)
+        stats.record_student_registered(db, sum(r["role"] == "student" for r in records))
+        db.commit()
+        return {}
+    except IntegrityError:
+        db.rollback()
+
+    # Lost a race with a concurrent registration; retry row by row so only
+    # the conflicting rows are reported
+    failed = {}
+    for record in records:
+        try:
+            db.execute(insert(User), [record])
+            stats.record_student_registered(db, int(record["role"] == "student"))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            failed[record["email"]] = "Email already registered"
+    return failed
+
+async def import_students(db: Session, lines, fmt: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Stream users from ``lines`` into the users table in batches.
+
+    Each batch costs one email lookup, one parallel hashing round and one
+    executemany insert. Returns a report with per-row errors.
+    """
+    rows = iter_rows(lines, fmt)
+    seen = set()
+    report = {"created": 0, "skipped": 0, "errors": []}
+
+    def error(number, email, message):
+        report["errors"].append({"row": number, "email": email, "error": message})
+
+    while True:
+        batch = await run_in_threadpool(lambda: list(islice(rows, batch_size)))
+        if not batch:
+            break
+
+        valid = []
+        for number, row in batch:
+            if isinstance(row, Exception) or not isinstance(row, dict):
+                error(number, None, "Malformed row")
+                continue
+            row.setdefault("role", "student")
+            try:
+                user = UserCreate(**row)
+            except ValidationError as e:
+                error(number, row.get("email"), "; ".join(err["msg"] for err in e.errors()))
+                continue
+            if user.email in seen:
+                report["skipped"] += 1
+                error(number, user.email, "Duplicate email in input")
+                continue
+            seen.add(user.email)
+            valid.append((number, user))
+
+        if not valid:
+            continue
+
+        taken = await run_db(db, existing_emails, [user.email for _, user in valid])
+        for number, user in valid:
+            if user.email in taken:
+                report["skipped"] += 1
+                error(number, user.email, "Email already registered")
+        valid = [(number, user) for number, user in valid if user.email not in taken]
+        if not valid:
+            continue
+
+        hashes = await password_hasher.hash_many([user.password for _, user in valid])
+        records = [
+            {
+                "email": user.email,
+                "hashed_password": hashed,
+                "full_name": user.full_name,
+                "role": user.role,
+                "department": user.department,
+                "year": user.year,
+            }
+            for (_, user), hashed in zip(valid, hashes)
+        ]
+
+        failed = await run_db(db, insert_users, records)
+        for number, user in valid:
+            if user.email in failed:
+                report["skipped"] += 1
+                error(number, user.email, failed[user.email])
+        report["created"] += len(valid) - len(failed)
+
+    return report
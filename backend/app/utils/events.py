@@ -0,0 +1,107 @@
+import asyncio
+import json
+import threading
+from typing import Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from ..config import settings
+
+# In-process event bus behind the faculty push channel. Publishers never
+# block: each subscriber has a bounded queue, and one that falls behind
+# loses its backlog and is told to resync (refetch) instead of stalling
+# the request that published.
+
+# Activity fields sent with each event; enough to update a queue in place
+EVENT_FIELDS = (
+    "id", "user_id", "category", "title", "description", "status",
+    "department", "year", "created_at", "proof_url",
+)
+
+class Subscription:
+
+    def __init__(self, bus, department: Optional[str], year: Optional[str], max_queue: int):
+        self.bus = bus
+        self.department = department
+        self.year = year
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.loop = asyncio.get_running_loop()
+        self.dropped = 0
+
+    def wants(self, event) -> bool:
+        activity = event["activity"]
+        if self.department and activity.get("department") != self.department:
+            return False
+        if self.year and activity.get("year") != self.year:
+            return False
+        return True
+
+    def offer(self, event):
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+    async def get(self, timeout: float):
+        """Next event, or None if nothing arrived within ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+class EventBus:
+
+    def __init__(self, max_queue: int):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, department=None, year=None) -> Subscription:
+        subscription = Subscription(self, department, year, self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event_type: str, activity: dict):
+        """Fan an activity event out to interested subscribers; never blocks."""
+        payload = {field: activity.get(field) for field in EVENT_FIELDS}
+        if payload["id"] is None and "_id" in activity:
+            payload["id"] = str(activity["_id"])
+        event = {"type": event_type, "activity": jsonable_encoder(payload)}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        self.published += 1
+        for subscription in subscribers:
+            if not subscription.wants(event):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+    def stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in subscribers),
+        }
+
+def format_sse(event) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+event_bus = EventBus(settings.event_queue_size)
@@ -0,0 +1,74 @@
+import base64
+
+from bson import json_util
+from bson.json_util import RELAXED_JSON_OPTIONS
+from fastapi import HTTPException
+
+ASCENDING = 1
+DESCENDING = -1
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values) -> str:
+    payload = json_util.dumps(list(values), json_options=RELAXED_JSON_OPTIONS)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def _is_instance(value, types) -> bool:
+    # bool is an int subclass, but never a valid key or offset
+    return isinstance(value, types) and not isinstance(value, bool)
+
+def decode_cursor(cursor: str, types):
+    """Decode a cursor holding one value per entry of ``types`` (a type or tuple of types)."""
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        values = None
+    if (
+        not isinstance(values, list)
+        or len(values) != len(types)
+        or not all(_is_instance(value, kind) for value, kind in zip(values, types))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def sort_direction(order: str) -> int:
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    return ASCENDING if order == "asc" else DESCENDING
+
+def parse_fields(fields, allowed, required=()):
+    """Turn a comma separated ``fields`` parameter into a list of field names."""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(allowed))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys([*required, *names]))
+
+def keyset_filter(query: dict, keys: dict, cursor: str, direction: int) -> dict:
+    """Add a "strictly after cursor" condition on the (k1, k2, ...) sort key.
+
+    ``keys`` maps each sort field, in order, to the type(s) its cursor value may have.
+    """
+    if not cursor:
+        return query
+    values = decode_cursor(cursor, list(keys.values()))
+    keys = list(keys)
+    op = "$gt" if direction == ASCENDING else "$lt"
+    branches = []
+    for i, key in enumerate(keys):
+        branch = {k: v for k, v in zip(keys[:i], values[:i])}
+        branch[key] = {op: values[i]}
+        branches.append(branch)
+    query = dict(query)
+    # Kept next to the top-level equality fields so they can still use indexes
+    if "$or" in query:
+        query["$and"] = query.get("$and", []) + [{"$or": branches}]
+    else:
+        query["$or"] = branches
+    return query
@@ -0,0 +1,134 @@
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.portfolio import StudentSummary
+from ..models.user import AcademicRecord
+from .skills import skill_labels
+
+# Per-student portfolio read model. The academic part is recomputed from
+# the student's own (indexed) records whenever one changes; the activity
+# part is adjusted by deltas as activities are approved or un-approved.
+# Summaries are built from scratch on first read, so writers only touch
+# students that already have one.
+
+def _empty_summary(user_id: int) -> StudentSummary:
+    return StudentSummary(
+        user_id=user_id, credits_earned=0, total_credits=0, semesters=0,
+        approved_activities=0, activities_by_category={}, skills={},
+    )
+
+def _summary_for_update(db: Session, user_id: int, create=False):
+    summary = (
+        db.query(StudentSummary)
+        .filter(StudentSummary.user_id == user_id)
+        .with_for_update()
+        .first()
+    )
+    if summary is None and create:
+        summary = _empty_summary(user_id)
+        db.add(summary)
+    return summary
+
+def lock_summary(db: Session, user_id: int):
+    """Create or lock the student's summary row ahead of ``rebuild_summary``.
+
+    Call before reading the student's activities; the transaction stays
+    open until the rebuild commits. An approval landing in between finds
+    the row and waits on it, then applies its delta on top of the rebuilt
+    summary instead of being skipped or overwritten.
+    """
+    if _summary_for_update(db, user_id) is None:
+        db.add(_empty_summary(user_id))
+        try:
+            db.flush()
+            return
+        except IntegrityError:
+            # A concurrent first read created it
+            db.rollback()
+    # A write, since SQLite ignores FOR UPDATE but holds its write lock
+    # from the first write to the commit
+    db.query(StudentSummary).filter(StudentSummary.user_id == user_id).update(
+        {"approved_activities": 0}, synchronize_session=False
+    )
+
+def _apply_academic(db: Session, summary: StudentSummary):
+    weighted, earned, total, semesters = db.query(
+        func.sum(AcademicRecord.gpa * AcademicRecord.credits_earned),
+        func.sum(AcademicRecord.credits_earned),
+        func.sum(AcademicRecord.total_credits),
+        func.count(AcademicRecord.id),
+    ).filter(AcademicRecord.user_id == summary.user_id).one()
+    summary.credits_earned = earned or 0
+    summary.total_credits = total or 0
+    summary.semesters = semesters or 0
+    # Credit-weighted mean of semester GPAs
+    summary.cgpa = round(weighted / earned, 2) if earned else None
+
+def _apply_activity(summary: StudentSummary, activity: dict, sign: int):
+    categories = dict(summary.activities_by_category or {})
+    category = activity.get("category")
+    if category:
+        categories[category] = categories.get(category, 0) + sign
+        if categories[category] <= 0:
+            del categories[category]
+
+    skills = {k: dict(v) for k, v in (summary.skills or {}).items()}
+    # Each skill counts once per activity, however it was spelled
+    for key, label in skill_labels(activity.get("skills_gained")).items():
+        entry = skills.setdefault(key, {"skill": label, "count": 0})
+        entry["count"] += sign
+        if entry["count"] <= 0:
+            del skills[key]
+
+    # Reassign so SQLAlchemy sees the JSON columns change
+    summary.activities_by_category = categories
+    summary.skills = skills
+    summary.approved_activities = max(0, (summary.approved_activities or 0) + sign)
+
+def refresh_academic(db: Session, user_ids):
+    for user_id in set(user_ids):
+        summary = _summary_for_update(db, user_id)
+        if summary is not None:
+            _apply_academic(db, summary)
+    db.commit()
+
+def record_activity_status(db: Session, activities, old_status, new_status):
+    """Adjust summaries for activities moving into or out of "approved"."""
+    if (old_status == "approved") == (new_status == "approved"):
+        return
+    sign = 1 if new_status == "approved" else -1
+    for activity in activities:
+        summary = _summary_for_update(db, activity["user_id"])
+        if summary is not None:
+            _apply_activity(summary, activity, sign)
+    db.commit()
+
+def rebuild_summary(db: Session, user_id: int, approved_activities):
+    """Build one student's summary from scratch (after ``lock_summary``)."""
+    summary = _summary_for_update(db, user_id, create=True)
+    summary.approved_activities = 0
+    summary.activities_by_category = {}
+    summary.skills = {}
+    _apply_academic(db, summary)
+    for activity in approved_activities:
+        _apply_activity(summary, activity, 1)
+    db.commit()
+    return summary
+
+def get_summary(db: Session, user_id: int):
+    return db.get(StudentSummary, user_id)
+
+def summary_response(summary: StudentSummary) -> dict:
+    skills = sorted((summary.skills or {}).values(), key=lambda s: (-s["count"], s["skill"].casefold()))
+    return {
+        "user_id": summary.user_id,
+        "cgpa": summary.cgpa,
+        "credits_earned": summary.credits_earned,
+        "total_credits": summary.total_credits,
+        "semesters": summary.semesters,
+        "approved_activities": summary.approved_activities,
+        "activities_by_category": summary.activities_by_category or {},
+        "skills": skills,
+        "updated_at": summary.updated_at,
+    }
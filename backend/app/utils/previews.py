@@ -0,0 +1,178 @@
+"""Background thumbnail/preview generation for proof files.
+
+Previews are small JPEGs stored next to the original as
+``<sha256>.thumb.jpg``: a thumbnail for images, the first page for PDFs.
+They are made in a small process pool after an upload and are best
+effort: if the pool is saturated or a format can't be rendered, the
+activity simply has no thumbnail_url. The URL is stored on the activity
+(at creation if the preview already exists, else by an ``on_ready``
+listener when it finishes), so listings never touch the disk.
+
+Images need Pillow; PDFs additionally need poppler's ``pdftoppm`` on PATH.
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from ..config import settings
+from .uploads import disk_path
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".tif", ".tiff"}
+PREVIEW_EXTENSIONS = IMAGE_EXTENSIONS | {".pdf"}
+THUMB_SUFFIX = ".thumb.jpg"
+
+def preview_path(path: str) -> str:
+    root, _ = os.path.splitext(path)
+    return root + THUMB_SUFFIX
+
+def preview_url(proof_url):
+    """The thumbnail URL for a proof, if one has been generated (checks the disk)."""
+    path = disk_path(proof_url)
+    if path is None or path.endswith(THUMB_SUFFIX):
+        return None
+    return preview_path(proof_url) if os.path.isfile(preview_path(path)) else None
+
+def _thumbnail(image, target: str, size: int):
+    from PIL import Image
+
+    image.thumbnail((size, size), Image.LANCZOS)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.save(target, "JPEG", quality=80, optimize=True)
+
+def _render_image(source: str, target: str, size: int):
+    from PIL import Image
+
+    with Image.open(source) as image:
+        # Let the JPEG decoder downscale while decoding
+        image.draft("RGB", (size * 2, size * 2))
+        _thumbnail(image, target, size)
+
+def _render_pdf(source: str, target: str, size: int):
+    from PIL import Image
+
+    if shutil.which("pdftoppm") is None:
+        return False
+    with tempfile.TemporaryDirectory() as tmp:
+        prefix = os.path.join(tmp, "page")
+        subprocess.run(
+            ["pdftoppm", "-f", "1", "-l", "1", "-singlefile", "-scale-to", str(size * 2), "-png", source, prefix],
+            check=True, capture_output=True, timeout=30,
+        )
+        with Image.open(prefix + ".png") as image:
+            _thumbnail(image, target, size)
+    return True
+
+def generate_preview(source: str, size: int, ext=None):
+    """Worker entry point; returns the preview path or None.
+
+    ``ext`` names the format of a source stored without an extension.
+    """
+    target = preview_path(source)
+    if os.path.exists(target):
+        return target
+    ext = ext or os.path.splitext(source)[1].lower()
+    tmp_target = f"{target}.{os.getpid()}.tmp"
+    try:
+        if ext in IMAGE_EXTENSIONS:
+            _render_image(source, tmp_target, size)
+        elif ext == ".pdf":
+            if not _render_pdf(source, tmp_target, size):
+                return None
+        else:
+            return None
+        os.replace(tmp_target, target)
+        return target
+    finally:
+        if os.path.exists(tmp_target):
+            os.remove(tmp_target)
+
+class PreviewPipeline:
+    """Fire-and-forget preview jobs on a bounded process pool."""
+
+    def __init__(self, workers: int, max_pending: int, size: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.size = size
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._listeners = []
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def submit(self, path: str, ext=None) -> bool:
+        if self.workers <= 0:
+            return False
+        ext = ext or os.path.splitext(path)[1].lower()
+        if ext not in PREVIEW_EXTENSIONS:
+            return False
+        if os.path.exists(preview_path(path)):
+            return False
+        with self._lock:
+            if path in self._pending:
+                return False
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending.add(path)
+            future = self._get_executor().submit(generate_preview, path, self.size, ext)
+        future.add_done_callback(lambda f: self._done(path, f))
+        return True
+
+    def on_ready(self, listener):
+        """Call ``listener(source_path, preview_path)`` whenever a preview is generated."""
+        self._listeners.append(listener)
+
+    def _done(self, path, future):
+        with self._lock:
+            self._pending.discard(path)
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self.failed += 1
+                logger.warning("Preview generation failed for %s: %s", path, future.exception())
+                return
+            self.completed += 1
+        preview = future.result()
+        if preview is None:
+            return
+        for listener in self._listeners:
+            try:
+                listener(path, preview)
+            except Exception:
+                logger.exception("Preview listener failed for %s", path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "completed": self.completed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+preview_pipeline = PreviewPipeline(settings.preview_workers, settings.preview_max_pending, settings.preview_size)
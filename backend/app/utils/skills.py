@@ -0,0 +1,206 @@
+import re
+
+from collections import Counter
+
+from sqlalchemy import distinct, func, insert
+from sqlalchemy.orm import Session
+
+from ..models.skill import Skill, SkillPosting
+from ..models.user import User
+from .stats import _upsert
+
+# Skill index. Activities store ``skills_gained`` as free text, so skills
+# are normalized into tokens and every approved activity gets one posting
+# per distinct token. Writers maintain the postings as activities are
+# approved or un-approved; rebuild_skill_index backfills existing data.
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Upper bound for a prefix range scan on the skill column
+_PREFIX_END = "\U0010ffff"
+
+def normalize_skill(skill) -> str:
+    """Canonical form used to deduplicate skills ("  Machine  learning" == "machine learning")."""
+    if not isinstance(skill, str):
+        return ""
+    return _WHITESPACE.sub(" ", skill).strip().casefold()
+
+def clean_label(skill: str) -> str:
+    return _WHITESPACE.sub(" ", skill).strip()
+
+def skill_labels(skills) -> dict:
+    """Map each distinct normalized skill to the first spelling seen."""
+    labels = {}
+    for label in skills or []:
+        key = normalize_skill(label)
+        if key:
+            labels.setdefault(key, clean_label(label))
+    return labels
+
+def _apply_skill_counts(db: Session, deltas: Counter, labels: dict):
+    insert_stmt = _upsert(db)
+    for key, delta in deltas.items():
+        if delta > 0:
+            stmt = insert_stmt(Skill).values(skill=key, label=labels[key], activity_count=delta)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Skill.skill],
+                set_={"activity_count": Skill.activity_count + delta},
+            )
+            db.execute(stmt)
+        elif delta < 0:
+            db.query(Skill).filter(Skill.skill == key).update(
+                {"activity_count": Skill.activity_count + delta}, synchronize_session=False
+            )
+    if any(delta < 0 for delta in deltas.values()):
+        db.query(Skill).filter(Skill.activity_count <= 0).delete(synchronize_session=False)
+
+def index_activities(db: Session, activities):
+    deltas = Counter()
+    labels = {}
+    insert_stmt = _upsert(db)
+    for activity in activities:
+        for key, label in skill_labels(activity.get("skills_gained")).items():
+            stmt = insert_stmt(SkillPosting).values(
+                skill=key,
+                activity_id=str(activity["_id"]),
+                user_id=activity["user_id"],
+                department=activity.get("department"),
+                year=activity.get("year"),
+            ).on_conflict_do_nothing()
+            if db.execute(stmt).rowcount:
+                deltas[key] += 1
+                labels.setdefault(key, label)
+    _apply_skill_counts(db, deltas, labels)
+
+def unindex_activities(db: Session, activity_ids):
+    activity_ids = [str(activity_id) for activity_id in activity_ids]
+    postings = db.query(SkillPosting.skill).filter(SkillPosting.activity_id.in_(activity_ids)).all()
+    if not postings:
+        return
+    db.query(SkillPosting).filter(SkillPosting.activity_id.in_(activity_ids)).delete(synchronize_session=False)
+    deltas = Counter()
+    for (key,) in postings:
+        deltas[key] -= 1
+    _apply_skill_counts(db, deltas, {})
+
+def record_activity_status(db: Session, activities, old_status, new_status):
+    """Index activities moving into "approved", drop those moving out."""
+    if (old_status == "approved") == (new_status == "approved"):
+        return
+    if new_status == "approved":
+        index_activities(db, activities)
+    else:
+        unindex_activities(db, [activity["_id"] for activity in activities])
+    db.commit()
+
+def move_student(db: Session, user_id: int, department, year):
+    db.query(SkillPosting).filter(SkillPosting.user_id == user_id).update(
+        {"department": department, "year": year}, synchronize_session=False
+    )
+    db.commit()
+
+def rebuild_skill_index(db: Session, collection, batch_size=1000):
+    """Recompute the whole index from the approved activities."""
+    db.query(SkillPosting).delete()
+    db.query(Skill).delete()
+
+    counts = Counter()
+    labels = {}
+    batch = []
+    cursor = collection.find(
+        {"status": "approved"}, ["user_id", "department", "year", "skills_gained"]
+    )
+    for activity in cursor:
+        for key, label in skill_labels(activity.get("skills_gained")).items():
+            counts[key] += 1
+            labels.setdefault(key, label)
+            batch.append({
+                "skill": key,
+                "activity_id": str(activity["_id"]),
+                "user_id": activity["user_id"],
+                "department": activity.get("department"),
+                "year": activity.get("year"),
+            })
+        if len(batch) >= batch_size:
+            db.execute(insert(SkillPosting), batch)
+            batch = []
+    if batch:
+        db.execute(insert(SkillPosting), batch)
+    if counts:
+        db.execute(insert(Skill), [
+            {"skill": key, "label": labels[key], "activity_count": count}
+            for key, count in counts.items()
+        ])
+    db.commit()
+    return len(counts)
+
+def autocomplete(db: Session, prefix: str, limit: int):
+    prefix = normalize_skill(prefix)
+    rows = (
+        db.query(Skill.label, Skill.activity_count)
+        .filter(Skill.skill >= prefix, Skill.skill < prefix + _PREFIX_END)
+        .order_by(Skill.activity_count.desc(), Skill.skill)
+        .limit(limit)
+        .all()
+    )
+    return [{"skill": label, "activities": count} for label, count in rows]
+
+def search_students(db: Session, skills, department=None, year=None, limit=20, offset=0):
+    """Students with approved activities for any of ``skills``, best match first.
+
+    Ranked by how many of the requested skills a student covers, then by
+    how many approved activities back them.
+    """
+    keys = list(skill_labels(skills))
+    if not keys:
+        return []
+
+    filters = [SkillPosting.skill.in_(keys)]
+    if department:
+        filters.append(SkillPosting.department == department)
+    if year:
+        filters.append(SkillPosting.year == year)
+
+    matches = {}
+    for user_id, key in db.query(SkillPosting.user_id, SkillPosting.skill).filter(*filters).distinct():
+        matches.setdefault(user_id, {"skills": [], "activities": 0})["skills"].append(key)
+    # An activity tagged with several of the skills counts once
+    for user_id, count in (
+        db.query(SkillPosting.user_id, func.count(distinct(SkillPosting.activity_id)))
+        .filter(*filters)
+        .group_by(SkillPosting.user_id)
+    ):
+        matches[user_id]["activities"] = count
+
+    ranked = sorted(matches, key=lambda uid: (-len(matches[uid]["skills"]), -matches[uid]["activities"], uid))
+    page = ranked[offset:offset + limit]
+    if not page:
+        return []
+
+    users = {
+        row.id: row for row in
+        db.query(User.id, User.full_name, User.email, User.department, User.year).filter(User.id.in_(page))
+    }
+    activity_ids = {}
+    for user_id, activity_id in (
+        db.query(SkillPosting.user_id, SkillPosting.activity_id)
+        .filter(SkillPosting.user_id.in_(page), *filters)
+        .distinct()
+    ):
+        activity_ids.setdefault(user_id, []).append(activity_id)
+
+    labels = dict(db.query(Skill.skill, Skill.label).filter(Skill.skill.in_(keys)))
+    results = []
+    for user_id in page:
+        user = users.get(user_id)
+        results.append({
+            "user_id": user_id,
+            "full_name": user.full_name if user else None,
+            "email": user.email if user else None,
+            "department": user.department if user else None,
+            "year": user.year if user else None,
+            "matched_skills": sorted(labels.get(key, key) for key in matches[user_id]["skills"]),
+            "matched_activities": matches[user_id]["activities"],
+            "activity_ids": activity_ids.get(user_id, []),
+        })
+    return results
@@ -0,0 +1,149 @@
+from collections import Counter
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.analytics import AnalyticsCounter
+from ..models.user import User
+from .analytics import summarize_activities
+
+# Materialized counters behind /analytics. Writers apply deltas as they go,
+# readers fetch the whole (small) table instead of scanning activities.
+
+BREAKDOWNS = {
+    "department": "department_wise",
+    "status": "status_wise",
+    "category": "category_wise",
+    "month": "monthly",
+}
+
+# Arbitrary application-wide key for pg_advisory_xact_lock
+REBUILD_LOCK_KEY = 0x5354415453
+
+UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def _upsert(db: Session):
+    dialect = db.get_bind().dialect.name
+    return postgresql.insert if dialect == "postgresql" else sqlite.insert
+
+def _add_delta(db: Session, scope, key, delta):
+    # Other dialects: update, else insert; a concurrent insert of the same
+    # counter makes ours fail, and the update then finds it
+    counter = db.query(AnalyticsCounter).filter_by(scope=scope, key=key)
+    if counter.update({"value": AnalyticsCounter.value + delta}, synchronize_session=False):
+        return
+    try:
+        with db.begin_nested():
+            db.add(AnalyticsCounter(scope=scope, key=key, value=delta))
+    except IntegrityError:
+        counter.update({"value": AnalyticsCounter.value + delta}, synchronize_session=False)
+
+def apply_deltas(db: Session, deltas):
+    """Atomically add each delta in ``{(scope, key): n}`` to its counter."""
+    insert = UPSERTS.get(db.get_bind().dialect.name)
+    for (scope, key), delta in deltas.items():
+        if not delta or key is None:
+            continue
+        if insert is None:
+            _add_delta(db, scope, key, delta)
+            continue
+        stmt = insert(AnalyticsCounter).values(scope=scope, key=key, value=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AnalyticsCounter.scope, AnalyticsCounter.key],
+            set_={"value": AnalyticsCounter.value + delta},
+        )
+        db.execute(stmt)
+
+def record_activity_created(db: Session, activity: dict, department):
+    created_at = activity.get("created_at")
+    apply_deltas(db, {
+        ("totals", "total_activities"): 1,
+        ("department", department): 1,
+        ("status", activity.get("status")): 1,
+        ("category", activity.get("category")): 1,
+        ("month", created_at.strftime("%Y-%m") if created_at else None): 1,
+    })
+    db.commit()
+
+def record_status_change(db: Session, old_status, new_status, count=1):
+    if old_status == new_status or not count:
+        return
+    deltas = Counter()
+    deltas[("status", old_status)] -= count
+    deltas[("status", new_status)] += count
+    apply_deltas(db, deltas)
+    db.commit()
+
+def record_department_change(db: Session, old_department, new_department, count):
+    if old_department == new_department or not count:
+        return
+    deltas = Counter()
+    deltas[("department", old_department)] -= count
+    deltas[("department", new_department)] += count
+    apply_deltas(db, deltas)
+    db.commit()
+
+def record_student_registered(db: Session, count=1):
+    apply_deltas(db, {("totals", "total_students"): count})
+
+def _has_meta(db: Session) -> bool:
+    return db.query(AnalyticsCounter.key).filter(AnalyticsCounter.scope == "meta").first() is not None
+
+def rebuild_counters(db: Session, collection, if_missing=False):
+    """Recompute every counter from the source data in one pass.
+
+    With ``if_missing``, skip it when the counters exist by the time this
+    rebuild gets its turn (another reader built them meanwhile).
+    """
+    # Concurrent rebuilds would both insert every row: take turns
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": REBUILD_LOCK_KEY})
+    else:
+        # Any write takes SQLite's write lock until the commit
+        db.query(AnalyticsCounter).filter(AnalyticsCounter.scope == "meta").update(
+            {"value": AnalyticsCounter.value}, synchronize_session=False
+        )
+    if if_missing and _has_meta(db):
+        db.commit()
+        return
+    # Deleting first takes the row locks (and SQLite's write lock) for the
+    # whole rebuild: concurrent writers wait, then apply their deltas on
+    # top of the rebuilt counters instead of being wiped by it
+    db.query(AnalyticsCounter).delete()
+    summary = summarize_activities(db, collection)
+    total_students = db.query(User).filter(User.role == "student").count()
+
+    rows = [
+        AnalyticsCounter(scope="meta", key="rebuilt", value=1),
+        AnalyticsCounter(scope="totals", key="total_students", value=total_students),
+        AnalyticsCounter(scope="totals", key="total_activities", value=summary["total_activities"]),
+    ]
+    for scope, field in BREAKDOWNS.items():
+        rows.extend(
+            AnalyticsCounter(scope=scope, key=key, value=value)
+            for key, value in summary[field].items()
+        )
+    db.add_all(rows)
+    db.commit()
+
+def read_counters(db: Session, collection, write_db: Session = None):
+    """Read the counters via ``db`` (possibly a replica); ``write_db`` rebuilds them."""
+    rows = db.query(AnalyticsCounter).all()
+    if not any(row.scope == "meta" for row in rows):
+        # Counters were never materialized from the existing data, or a
+        # lagging replica hasn't seen them yet
+        write_db = write_db or db
+        rebuild_counters(write_db, collection, if_missing=True)
+        rows = write_db.query(AnalyticsCounter).all()
+
+    result = {"total_students": 0, "total_activities": 0}
+    result.update({field: {} for field in BREAKDOWNS.values()})
+    for row in rows:
+        if row.scope == "totals":
+            result[row.key] = row.value
+        elif row.scope in BREAKDOWNS and row.value:
+            result[BREAKDOWNS[row.scope]][row.key] = row.value
+    result["monthly"] = dict(sorted(result["monthly"].items()))
+    return result
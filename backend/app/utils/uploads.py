@@ -0,0 +1,102 @@
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+from dataclasses import dataclass
+
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+
+from ..config import settings
+
+# Public URL prefix for stored proofs, served by routers/proofs.py
+UPLOAD_URL_PREFIX = "uploads/"
+
+class UploadTooLarge(Exception):
+    pass
+
+@dataclass(frozen=True)
+class StoredFile:
+    sha256: str
+    size: int
+    path: str  # on disk, under settings.upload_dir: ab/ab12...ef
+    url: str  # e.g. uploads/ab/ab12...ef.pdf
+    extension: str  # of this upload's filename, e.g. ".pdf"
+    media_type: str
+
+def _extension(filename) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if re.fullmatch(r"\.[a-z0-9]{1,10}", ext) else ""
+
+def disk_path(url: str):
+    """Map a proof URL back to its file under upload_dir, or None."""
+    if not url or not url.startswith(UPLOAD_URL_PREFIX):
+        return None
+    parts = url[len(UPLOAD_URL_PREFIX):].split("/")
+    if any(part in ("", ".", "..") for part in parts):
+        return None
+    return os.path.join(settings.upload_dir, *parts)
+
+def upload_url(path: str, upload_dir=None) -> str:
+    """The public URL of a file under upload_dir (inverse of ``disk_path``)."""
+    return UPLOAD_URL_PREFIX + os.path.relpath(path, upload_dir or settings.upload_dir).replace(os.sep, "/")
+
+def media_type(extension: str) -> str:
+    return mimetypes.guess_type("proof" + extension)[0] or "application/octet-stream"
+
+def content_path(sha256: str, upload_dir=None) -> str:
+    # Keyed on the hash alone, so the same bytes uploaded under another
+    # extension share the file; the extension only lives in the URL.
+    # Fanned out by hash prefix so no single directory grows unbounded.
+    return os.path.join(upload_dir or settings.upload_dir, sha256[:2], sha256)
+
+async def store_upload(file: UploadFile, max_bytes=None, chunk_size=None, upload_dir=None) -> StoredFile:
+    """Stream ``file`` to disk in chunks, hashing as it goes.
+
+    The file is written to a temporary name and then moved to its content
+    address, so identical uploads share one copy and a same-named upload
+    can never overwrite a different file. Raises UploadTooLarge (and
+    leaves nothing behind) as soon as ``max_bytes`` is exceeded.
+    """
+    max_bytes = max_bytes or settings.max_upload_bytes
+    chunk_size = chunk_size or settings.upload_chunk_bytes
+    upload_dir = upload_dir or settings.upload_dir
+
+    tmp_dir = os.path.join(upload_dir, "tmp")
+    await aiofiles.os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            while chunk := await file.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                await out.write(chunk)
+
+        sha256 = digest.hexdigest()
+        path = content_path(sha256, upload_dir)
+        if await aiofiles.os.path.exists(path):
+            await aiofiles.os.remove(tmp_path)
+        else:
+            await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+            await aiofiles.os.replace(tmp_path, path)
+    except BaseException:
+        if await aiofiles.os.path.exists(tmp_path):
+            await aiofiles.os.remove(tmp_path)
+        raise
+
+    extension = _extension(file.filename)
+    return StoredFile(
+        sha256=sha256,
+        size=size,
+        path=path,
+        url=upload_url(path, upload_dir) + extension,
+        extension=extension,
+        media_type=media_type(extension),
+    )
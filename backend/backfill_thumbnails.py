@@ -0,0 +1,21 @@
+"""Store thumbnail_url on activities whose proof preview already exists.
+
+Listings used to check the disk for a preview on every read. They now
+return the stored field, which activities created before the change
+lack. Safe to re-run. Against the file-backed fallback store, stop the
+server first; the store refuses a second process.
+"""
+
+from app.mongo import activities_collection
+from app.utils.previews import preview_url
+
+updated = 0
+for activity in activities_collection.find(
+    {"proof_url": {"$ne": None}, "thumbnail_url": {"$exists": False}}, ["proof_url"]
+):
+    thumbnail = preview_url(activity["proof_url"])
+    if thumbnail:
+        activities_collection.update_one({"_id": activity["_id"]}, {"$set": {"thumbnail_url": thumbnail}})
+        updated += 1
+
+print(f"Stored thumbnail_url on {updated} activities")
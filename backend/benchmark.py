@@ -0,0 +1,274 @@
+"""Load test for the hot API endpoints.
+
+Seeds a throwaway SQLite database and the in-memory (or file-backed)
+activities store with synthetic data, then drives the app in-process over
+ASGI with concurrent clients and reports latency percentiles and
+throughput per endpoint. Each endpoint is measured over several rounds
+and the best value of each metric is kept, which filters out most of
+the scheduling noise of a shared machine.
+
+With a baseline file present, a run fails (exit 1) when an endpoint's
+p95 or throughput is worse than the baseline by more than --tolerance.
+Baselines are only comparable on the same machine and scale; record one
+with --save-baseline.
+
+    python benchmark.py
+    python benchmark.py --students 5000 --concurrency 32 --save-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+DEPARTMENTS = ["CS", "EE", "ME", "CE", "IT"]
+YEARS = ["1st", "2nd", "3rd", "4th"]
+CATEGORIES = ["conference", "workshop", "hackathon", "internship", "certification", "volunteering"]
+SKILLS = ["Python", "Machine Learning", "React", "SQL", "Leadership", "Public Speaking", "Docker", "CAD"]
+PASSWORD = "benchmark"
+
+# Scale and load knobs that make two runs comparable
+CONFIG_KEYS = ("students", "records", "activities", "requests", "rounds", "concurrency", "store", "seed")
+
+def configure_environment(args, directory):
+    # Must run before anything imports app.config
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+    os.environ.pop("DATABASE_READ_URL", None)
+    os.environ["MONGO_URL"] = "mongodb://127.0.0.1:1"
+    os.environ["MONGO_CONNECT_TIMEOUT_MS"] = "1"
+    os.environ["FALLBACK_STORE"] = args.store
+    os.environ["FALLBACK_STORE_DIR"] = os.path.join(directory, "data")
+    os.environ["FALLBACK_STORE_FSYNC"] = "false"
+    os.environ["UPLOAD_DIR"] = os.path.join(directory, "uploads")
+    os.environ["PREVIEW_WORKERS"] = "0"
+    os.environ["PROFILING_ENABLED"] = "false"
+
+def seed(args):
+    from app.database import Base, SessionLocal, engine
+    from app.indexes import provision_indexes
+    from app.models.user import AcademicRecord, User
+    from app.mongo import activities_collection
+    from app.utils.auth import get_password_hash
+    from app.utils.stats import rebuild_counters
+
+    rng = random.Random(args.seed)
+    Base.metadata.create_all(bind=engine)
+    provision_indexes()
+
+    # One hash for everyone: hashing thousands of passwords would dominate
+    # the seeding time and isn't what we measure
+    hashed = get_password_hash(PASSWORD)
+
+    users = [{"email": "admin@bench.test", "full_name": "Admin", "role": "admin", "department": None, "year": None}]
+    for department in DEPARTMENTS:
+        for year in YEARS:
+            users.append({
+                "email": f"faculty-{department}-{year}@bench.test", "full_name": f"Faculty {department} {year}",
+                "role": "faculty", "department": department, "year": year,
+            })
+    for i in range(args.students):
+        users.append({
+            "email": f"student{i}@bench.test", "full_name": f"Student {i}", "role": "student",
+            "department": rng.choice(DEPARTMENTS), "year": rng.choice(YEARS),
+        })
+
+    db = SessionLocal()
+    db.bulk_insert_mappings(User, [dict(user, hashed_password=hashed, is_active=True) for user in users])
+    db.commit()
+
+    students = db.query(User.id, User.department, User.year).filter(User.role == "student").all()
+    db.bulk_insert_mappings(AcademicRecord, [
+        {
+            "user_id": student.id, "semester": f"S{semester}", "gpa": round(rng.uniform(5, 10), 2),
+            "credits_earned": rng.randint(16, 24), "total_credits": 24,
+        }
+        for student in students for semester in range(1, args.records + 1)
+    ])
+    db.commit()
+
+    now = datetime.utcnow().replace(microsecond=0)
+    activities = []
+    for student in students:
+        for _ in range(args.activities):
+            activities.append({
+                "user_id": student.id, "department": student.department, "year": student.year,
+                "category": rng.choice(CATEGORIES), "title": f"Activity {len(activities)}",
+                "description": "Synthetic benchmark activity", "duration": "1 day",
+                "skills_gained": rng.sample(SKILLS, 2),
+                "status": rng.choices(["pending", "approved", "rejected"], [3, 6, 1])[0],
+                "created_at": now - timedelta(minutes=rng.randint(0, 500000)),
+            })
+    activities_collection.insert_many(activities)
+
+    rebuild_counters(db, activities_collection)
+    db.close()
+    return [user["email"] for user in users if user["role"] == "student"]
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+async def drive(client, name, make_request, total, concurrency):
+    latencies = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal issued, errors
+        while issued < total:
+            issued += 1
+            start = time.perf_counter()
+            response = await make_request(client)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "rps": round(len(latencies) / elapsed, 1),
+    }
+
+async def run_scenarios(args, student_emails):
+    import httpx
+
+    from app.main import app
+
+    rng = random.Random(args.seed)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def login(email):
+                response = await client.post("/auth/token", data={"username": email, "password": PASSWORD})
+                response.raise_for_status()
+                return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            admin = await login("admin@bench.test")
+            faculty = [await login(f"faculty-{d}-{y}@bench.test") for d in DEPARTMENTS for y in YEARS]
+
+            scenarios = {
+                "POST /auth/token": lambda c: c.post(
+                    "/auth/token", data={"username": rng.choice(student_emails), "password": PASSWORD}
+                ),
+                "GET /activities/pending": lambda c: c.get("/activities/pending", headers=rng.choice(faculty)),
+                "GET /analytics/": lambda c: c.get("/analytics/", headers=admin),
+                "GET /academic/students/": lambda c: c.get("/academic/students/", headers=rng.choice(faculty)),
+            }
+
+            results = {}
+            for name, make_request in scenarios.items():
+                if args.only and args.only not in name:
+                    continue
+                # Warm caches and connection pools before measuring
+                await drive(client, name, make_request, min(20, args.requests), args.concurrency)
+                rounds = [
+                    await drive(client, name, make_request, args.requests, args.concurrency)
+                    for _ in range(args.rounds)
+                ]
+                results[name] = best_of(rounds)
+                print(format_row(name, results[name]), flush=True)
+            return results
+
+def best_of(rounds):
+    best = {key: min(r[key] for r in rounds) for key in ("p50_ms", "p95_ms", "p99_ms")}
+    best["rps"] = max(r["rps"] for r in rounds)
+    best["requests"] = sum(r["requests"] for r in rounds)
+    best["errors"] = sum(r["errors"] for r in rounds)
+    return best
+
+def format_row(name, result):
+    return (
+        f"{name:<28} {result['requests']:>6} {result['errors']:>6} "
+        f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['rps']:>9.1f}"
+    )
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of ``results`` against ``baseline``."""
+    failures = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        if result["errors"]:
+            failures.append(f"{name}: {result['errors']} failed requests")
+        if result["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            failures.append(f"{name}: p95 {result['p95_ms']}ms vs baseline {reference['p95_ms']}ms")
+        if result["rps"] < reference["rps"] * (1 - tolerance):
+            failures.append(f"{name}: {result['rps']} req/s vs baseline {reference['rps']} req/s")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the hot API endpoints in-process.")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--records", type=int, default=4, help="academic records per student")
+    parser.add_argument("--activities", type=int, default=5, help="activities per student")
+    parser.add_argument("--requests", type=int, default=300, help="measured requests per endpoint and round")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--store", choices=["memory", "file"], default="memory")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", help="run only endpoints whose name contains this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed relative regression")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="benchmark-")
+    configure_environment(args, directory)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    started = time.perf_counter()
+    student_emails = seed(args)
+    print(f"seeded {args.students} students in {time.perf_counter() - started:.1f}s ({directory})")
+
+    print(f"{'endpoint':<28} {'reqs':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    results = asyncio.run(run_scenarios(args, student_emails))
+
+    config = {key: getattr(args, key) for key in CONFIG_KEYS}
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as out:
+            json.dump({"config": config, "results": results}, out, indent=2, sort_keys=True)
+            out.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against")
+        return 0
+
+    with open(args.baseline) as stored:
+        baseline = json.load(stored)
+    if baseline.get("config") != config:
+        print(f"baseline was recorded with {baseline.get('config')}; not comparing")
+        return 0
+
+    failures = compare(results, baseline["results"], args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if not failures:
+        print(f"within {args.tolerance:.0%} of baseline")
+    return 1 if failures else 0
+
+# The password hashing pool spawns workers that re-import this module
+if __name__ == "__main__":
+    sys.exit(main())
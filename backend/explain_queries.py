@@ -0,0 +1,24 @@
+import sys
+
+from app.database import Base, SessionLocal, engine
+from app.indexes import explain_hot_queries, provision_indexes
+from app.mongo import activities_collection
+
+if "--provision" in sys.argv:
+    # Index creation needs the tables, which may predate newer models
+    Base.metadata.create_all(bind=engine)
+    provision_indexes()
+
+db = SessionLocal()
+report = explain_hot_queries(db, activities_collection)
+db.close()
+
+for row in report:
+    flag = "FAILED" if row.get("failed") else "FULL SCAN" if row["full_scan"] else "ok"
+    print(f"[{flag:>9}] {row['store']:<5} {row['query']}")
+    for line in row["plan"]:
+        print(f"            {line}")
+
+# Non-zero exit so CI can fail on a regression (or a missing index; run
+# with --provision to create them)
+sys.exit(1 if any(row["full_scan"] for row in report) else 0)
@@ -0,0 +1,36 @@
+import argparse
+import asyncio
+import json
+import os
+
+from app.database import SessionLocal, engine, Base
+from app.utils.auth import password_hasher
+from app.utils.bulk_import import DEFAULT_BATCH_SIZE, guess_format, import_students
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users from a CSV or JSON-lines file.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="password hashing processes")
+    args = parser.parse_args()
+
+    password_hasher.workers = args.workers
+
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        with open(args.path, encoding="utf-8-sig", newline="") as lines:
+            report = asyncio.run(import_students(db, lines, args.format or guess_format(args.path), args.batch_size))
+    finally:
+        db.close()
+        password_hasher.shutdown()
+
+    for err in report["errors"]:
+        print(f"row {err['row']}: {err['email'] or '-'}: {err['error']}")
+    print(json.dumps({"created": report["created"], "skipped": report["skipped"], "errors": len(report["errors"])}))
+
+# The hashing pool spawns workers that re-import this module
+if __name__ == "__main__":
+    main()
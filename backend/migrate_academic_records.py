@@ -0,0 +1,37 @@
+"""Dedupe academic records and add the unique (user_id, semester) index.
+
+Before the index existed, concurrent batches and the single-record
+endpoints could store a semester twice for the same student. The most
+recently written row (highest id) is kept, as an upsert would have done.
+The non-unique index it replaces is dropped. Safe to re-run.
+"""
+
+from sqlalchemy import func, text
+
+from app.database import Base, SessionLocal, engine
+from app.indexes import ensure_sql_indexes
+from app.models.user import AcademicRecord
+from app.utils import portfolio
+
+Base.metadata.create_all(bind=engine)
+
+db = SessionLocal()
+
+keep = db.query(func.max(AcademicRecord.id)).group_by(AcademicRecord.user_id, AcademicRecord.semester)
+duplicates = db.query(AcademicRecord.id, AcademicRecord.user_id).filter(AcademicRecord.id.notin_(keep)).all()
+
+affected = {user_id for _, user_id in duplicates}
+if duplicates:
+    db.query(AcademicRecord).filter(
+        AcademicRecord.id.in_([record_id for record_id, _ in duplicates])
+    ).delete(synchronize_session=False)
+    db.commit()
+    portfolio.refresh_academic(db, affected)
+
+db.execute(text("DROP INDEX IF EXISTS ix_academic_records_user_id_semester"))
+db.commit()
+db.close()
+
+ensure_sql_indexes()
+
+print(f"Removed {len(duplicates)} duplicate records for {len(affected)} students")
@@ -0,0 +1,43 @@
+"""Backfill department/year onto existing activity documents.
+
+Activities created before these fields were denormalized have neither,
+so they would not show up in the faculty pending queue. Activities of
+non-students had them copied too, which put them in their own author's
+queue; those are cleared. Safe to re-run. Against the file-backed
+fallback store, stop the server first; the store refuses a second process.
+"""
+
+from collections import defaultdict
+
+from app.database import SessionLocal
+from app.models.user import User
+from app.mongo import activities_collection
+
+CHUNK_SIZE = 500
+
+db = SessionLocal()
+
+groups = defaultdict(list)
+for user_id, department, year in db.query(User.id, User.department, User.year).filter(User.role == "student"):
+    groups[(department, year)].append(user_id)
+
+updated = 0
+for (department, year), user_ids in groups.items():
+    for start in range(0, len(user_ids), CHUNK_SIZE):
+        result = activities_collection.update_many(
+            {"user_id": {"$in": user_ids[start:start + CHUNK_SIZE]}},
+            {"$set": {"department": department, "year": year}}
+        )
+        updated += result.modified_count
+
+others = [user_id for (user_id,) in db.query(User.id).filter(User.role != "student")]
+for start in range(0, len(others), CHUNK_SIZE):
+    result = activities_collection.update_many(
+        {"user_id": {"$in": others[start:start + CHUNK_SIZE]}},
+        {"$set": {"department": None, "year": None}}
+    )
+    updated += result.modified_count
+
+db.close()
+
+print(f"Backfilled department/year on {updated} activities")
@@ -0,0 +1,35 @@
+"""Move content-addressed proof files to their hash-only names.
+
+Proofs used to be stored as ``ab/<sha256><ext>``, so the same bytes
+uploaded under two extensions were kept twice. They are now stored as
+``ab/<sha256>``, with the extension kept in the URL only; this renames
+the old files and drops the duplicate copies. URLs don't change, and
+proofs are served from either name meanwhile. Safe to re-run.
+"""
+
+import os
+import re
+
+from app.config import settings
+
+CONTENT_FILE = re.compile(r"(?P<sha256>[0-9a-f]{64})\.[a-z0-9]{1,10}")
+
+moved = removed = 0
+for prefix in sorted(os.listdir(settings.upload_dir)):
+    directory = os.path.join(settings.upload_dir, prefix)
+    if not re.fullmatch(r"[0-9a-f]{2}", prefix) or not os.path.isdir(directory):
+        continue
+    for name in sorted(os.listdir(directory)):
+        match = CONTENT_FILE.fullmatch(name)
+        if not match or name.endswith(".thumb.jpg"):
+            continue
+        source = os.path.join(directory, name)
+        target = os.path.join(directory, match["sha256"])
+        if os.path.exists(target):
+            os.remove(source)
+            removed += 1
+        else:
+            os.replace(source, target)
+            moved += 1
+
+print(f"Renamed {moved} proof files, removed {removed} duplicate copies")
@@ -0,0 +1,17 @@
+from app.database import SessionLocal, engine, Base
+from app.models.skill import Skill, SkillPosting
+from app.mongo import activities_collection
+from app.utils.skills import rebuild_skill_index
+
+# Backfills the skill index from activities approved before it existed
+
+Base.metadata.create_all(bind=engine)
+
+db = SessionLocal()
+rebuild_skill_index(db, activities_collection)
+
+print(f"{db.query(Skill).count()} skills, {db.query(SkillPosting).count()} postings")
+for skill in db.query(Skill).order_by(Skill.activity_count.desc()).limit(20):
+    print(f"{skill.label:<32} {skill.activity_count}")
+
+db.close()
@@ -0,0 +1,14 @@
+from app.database import SessionLocal, engine, Base
+from app.models.analytics import AnalyticsCounter
+from app.mongo import activities_collection
+from app.utils.stats import rebuild_counters
+
+Base.metadata.create_all(bind=engine)
+
+db = SessionLocal()
+rebuild_counters(db, activities_collection)
+
+for counter in db.query(AnalyticsCounter).order_by(AnalyticsCounter.scope, AnalyticsCounter.key):
+    print(f"{counter.scope:<12} {counter.key:<24} {counter.value}")
+
+db.close()
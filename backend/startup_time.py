@@ -0,0 +1,68 @@
+"""Measure the API's cold start against ``settings.startup_budget_ms``.
+
+Each run starts a fresh interpreter that imports ``app.main`` and runs the
+lifespan startup, the work a new worker process does before it can take
+requests. Reports import and startup time per run and exits 1 when the
+median total exceeds the budget.
+
+    python startup_time.py
+    python startup_time.py --runs 10 --budget-ms 800
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import asyncio, json, time
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def startup():
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+    return ready
+
+ready = asyncio.run(startup())
+print(json.dumps({"import_ms": (imported - start) * 1000, "startup_ms": (ready - imported) * 1000}))
+"""
+
+def measure():
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and startup time of the API.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=int, help="defaults to settings.startup_budget_ms")
+    args = parser.parse_args()
+
+    if args.budget_ms is None:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from app.config import settings
+        args.budget_ms = settings.startup_budget_ms
+
+    totals = []
+    print(f"{'run':>3} {'import ms':>10} {'startup ms':>11} {'total ms':>9}")
+    for run in range(1, args.runs + 1):
+        timing = measure()
+        total = timing["import_ms"] + timing["startup_ms"]
+        totals.append(total)
+        print(f"{run:>3} {timing['import_ms']:>10.0f} {timing['startup_ms']:>11.0f} {total:>9.0f}")
+
+    median = statistics.median(totals)
+    print(f"median {median:.0f} ms, budget {args.budget_ms} ms")
+    return 1 if median > args.budget_ms else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from app import filestore
+from app.filestore import CorruptLogError, FileCollection, StoreLockedError
+
+def reopen(collection):
+    collection.close()
+    return FileCollection(collection.name, os.path.dirname(collection.path), fsync=False)
+
+@pytest.fixture
+def collection(tmp_path):
+    collection = FileCollection("activities", str(tmp_path), fsync=False)
+    yield collection
+    collection.close()
+
+def test_replay_restores_documents_and_indexes(collection):
+    collection.insert_many([{"_id": i, "user_id": i % 2, "status": "pending"} for i in range(4)])
+    collection.update_one({"_id": 1}, {"$set": {"status": "approved"}})
+    collection.delete_one({"_id": 2})
+
+    reopened = reopen(collection)
+    assert sorted(doc["_id"] for doc in reopened.find({})) == [0, 1, 3]
+    assert reopened._candidates({"status": "approved"}) == {1}
+    assert reopened._candidates({"status": "pending"}) == {0, 3}
+    reopened.close()
+
+def test_torn_tail_is_truncated(collection):
+    collection.insert_one({"_id": 1, "status": "pending"})
+    collection.insert_one({"_id": 2, "status": "pending"})
+    size = os.path.getsize(collection.path)
+    with open(collection.path, "ab") as log:
+        log.write(b'0badc0de\t{"op": "put", "doc": {"_id": 3')
+
+    reopened = reopen(collection)
+    assert sorted(doc["_id"] for doc in reopened.find({})) == [1, 2]
+    assert os.path.getsize(reopened.path) == size
+    reopened.insert_one({"_id": 3, "status": "pending"})
+    reopened = reopen(reopened)
+    assert reopened.count_documents({}) == 3
+    reopened.close()
+
+def test_bad_checksum_on_last_record_is_truncated(collection):
+    collection.insert_one({"_id": 1})
+    collection.insert_one({"_id": 2})
+    with open(collection.path, "r+b") as log:
+        lines = log.readlines()
+        log.seek(len(lines[0]))
+        log.write(b"ffffffff")
+
+    reopened = reopen(collection)
+    assert [doc["_id"] for doc in reopened.find({})] == [1]
+    reopened.close()
+
+def test_corruption_mid_log_fails_loudly(collection):
+    for i in range(3):
+        collection.insert_one({"_id": i})
+    with open(collection.path, "r+b") as log:
+        log.write(b"ffffffff")
+    collection.close()
+
+    with pytest.raises(CorruptLogError):
+        FileCollection(collection.name, os.path.dirname(collection.path), fsync=False)
+
+def test_compaction_mid_update_keeps_indexes_consistent(collection, monkeypatch):
+    monkeypatch.setattr(filestore, "MIN_COMPACT_BYTES", 0)
+    collection.create_index([("title", "text"), ("description", "text")])
+    for i in range(5):
+        collection.insert_one({"_id": i, "status": "pending", "title": f"robotics workshop {i}", "description": "hands on"})
+    for _ in range(3):
+        collection.update_many({}, {"$set": {"status": "approved"}})
+        collection.update_many({}, {"$set": {"status": "pending"}})
+
+    fresh = reopen(collection)
+    fresh.create_index([("title", "text"), ("description", "text")])
+    assert os.path.getsize(fresh.path) < 5 * 400
+    assert collection.text_index.total_length == fresh.text_index.total_length
+    assert collection.text_index.lengths == fresh.text_index.lengths
+    assert fresh._candidates({"status": "pending"}) == set(range(5))
+    fresh.close()
+
+def test_second_opener_fails_fast(collection):
+    with pytest.raises(StoreLockedError):
+        FileCollection(collection.name, os.path.dirname(collection.path), fsync=False)
+    collection.insert_one({"_id": 1})
+    reopened = reopen(collection)
+    assert reopened.find_one({"_id": 1}) == {"_id": 1}
+    reopened.close()
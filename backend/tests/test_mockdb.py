@@ -0,0 +1,160 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.mockdb import MockCollection, apply_update, matches
+
+def seeded():
+    collection = MockCollection("activities")
+    collection.insert_many([
+        {"_id": 1, "user_id": 1, "status": "pending", "category": "workshop", "tags": ["a", "b"], "n": 5},
+        {"_id": 2, "user_id": 1, "status": "approved", "category": "hackathon", "tags": ["b"], "n": 10},
+        {"_id": 3, "user_id": 2, "status": "approved", "category": "workshop", "n": None},
+    ])
+    return collection
+
+# -- matcher ---------------------------------------------------------------
+
+@pytest.mark.parametrize("query, expected", [
+    ({"status": "pending"}, True),
+    ({"status": "approved"}, False),
+    ({"tags": "a"}, True),
+    ({"tags": ["a", "b"]}, True),
+    ({"n": {"$gt": 4, "$lte": 5}}, True),
+    ({"n": {"$gt": 5}}, False),
+    ({"status": {"$in": ["pending", "approved"]}}, True),
+    ({"status": {"$nin": ["approved"]}}, True),
+    ({"status": {"$ne": "approved"}}, True),
+    ({"missing": {"$exists": False}}, True),
+    ({"missing": None}, True),
+    ({"category": {"$regex": "^WORK", "$options": "i"}}, True),
+    ({"$or": [{"status": "approved"}, {"n": 5}]}, True),
+    ({"$and": [{"status": "pending"}, {"n": 6}]}, False),
+    ({"$nor": [{"status": "pending"}]}, False),
+    ({"meta.level": "x"}, False),
+])
+def test_matches(query, expected):
+    doc = {"status": "pending", "category": "workshop", "tags": ["a", "b"], "n": 5}
+    assert matches(doc, query) is expected
+
+def test_comparison_skips_missing_and_incomparable_values():
+    assert not matches({"n": None}, {"n": {"$lt": 3}})
+    assert not matches({}, {"n": {"$gte": 0}})
+    assert not matches({"n": "text"}, {"n": {"$gt": 1}})
+
+def test_unknown_query_operator_raises():
+    with pytest.raises(ValueError):
+        matches({"n": 1}, {"n": {"$near": 1}})
+
+# -- index candidate selection ---------------------------------------------
+
+def test_candidates_use_indexes():
+    collection = seeded()
+    assert collection._candidates({"status": "approved"}) == {2, 3}
+    assert collection._candidates({"status": "approved", "user_id": 1}) == {2}
+    assert collection._candidates({"status": {"$in": ["pending", "approved"]}}) == {1, 2, 3}
+    assert collection._candidates({"_id": {"$in": [1, 3]}, "status": "approved"}) == {3}
+
+def test_candidates_fall_back_to_scan():
+    collection = seeded()
+    assert collection._candidates({}) is None
+    assert collection._candidates({"status": {"$ne": "approved"}}) is None
+    assert collection._candidates({"category": "workshop"}) is None
+    assert [doc["_id"] for doc in collection.find({"status": {"$ne": "approved"}})] == [1]
+
+def test_indexes_follow_updates_and_deletes():
+    collection = seeded()
+    collection.update_one({"_id": 1}, {"$set": {"status": "approved"}})
+    assert collection._candidates({"status": "pending"}) == set()
+    assert collection.count_documents({"status": "approved"}) == 3
+    collection.delete_many({"user_id": 1})
+    assert collection._candidates({"status": "approved"}) == {3}
+
+def test_text_search_intersects_with_id_filter():
+    collection = MockCollection("activities")
+    collection.create_index([("title", "text"), ("description", "text")])
+    collection.insert_many([
+        {"_id": 1, "title": "AI hackathon", "description": ""},
+        {"_id": 2, "title": "Robotics workshop", "description": ""},
+    ])
+    found = collection.find({"$text": {"$search": "hackathon"}, "_id": {"$in": [1, 2]}})
+    assert [doc["_id"] for doc in found] == [1]
+
+# -- update operators ------------------------------------------------------
+
+def test_update_operators():
+    doc = {"n": 1, "tags": ["a"], "meta": {"x": 1}}
+    assert apply_update(doc, {
+        "$set": {"meta.y": 2},
+        "$inc": {"n": 2, "m": 1},
+        "$push": {"tags": {"$each": ["b", "c"]}},
+        "$unset": {"meta.x": ""},
+    })
+    assert doc == {"n": 3, "m": 1, "tags": ["a", "b", "c"], "meta": {"y": 2}}
+    apply_update(doc, {"$addToSet": {"tags": {"$each": ["a", "d"]}}, "$pull": {"tags": "b"}})
+    assert doc["tags"] == ["a", "c", "d"]
+
+def test_update_reports_no_change():
+    assert not apply_update({"status": "approved"}, {"$set": {"status": "approved"}})
+
+def test_set_on_insert_only_applies_to_upserts():
+    collection = MockCollection("activities")
+    collection.update_one({"key": "k"}, {"$set": {"a": 1}, "$setOnInsert": {"created": True}}, upsert=True)
+    collection.update_one({"key": "k"}, {"$set": {"a": 2}, "$setOnInsert": {"created": False}}, upsert=True)
+    doc = collection.find_one({"key": "k"})
+    assert doc["a"] == 2 and doc["created"] is True
+
+def test_unknown_update_operator_raises():
+    with pytest.raises(ValueError):
+        apply_update({}, {"$rename": {"a": "b"}})
+
+def test_find_one_and_update_returns_previous_document():
+    collection = seeded()
+    before = collection.find_one_and_update({"_id": 1, "status": {"$ne": "approved"}}, {"$set": {"status": "approved"}})
+    assert before["status"] == "pending"
+    assert collection.find_one_and_update({"_id": 1, "status": {"$ne": "approved"}}, {"$set": {"status": "approved"}}) is None
+
+def test_replace_one_swaps_document_and_upserts():
+    collection = seeded()
+    assert collection.replace_one({"_id": 1}, {"user_id": 3, "status": "approved"}).modified_count == 1
+    assert collection.find_one({"_id": 1}) == {"_id": 1, "user_id": 3, "status": "approved"}
+    assert collection.count_documents({"user_id": 1}) == 1
+    assert collection.replace_one({"_id": 9}, {"status": "pending"}).matched_count == 0
+    assert collection.replace_one({"_id": 9}, {"status": "pending"}, upsert=True).upserted_id == 9
+
+def test_retired_collection_forwards_writes():
+    collection, successor = seeded(), MockCollection("activities")
+    collection.retire(successor)
+    collection.insert_one({"_id": 4, "status": "pending"})
+    collection.update_one({"_id": 4}, {"$set": {"status": "approved"}})
+    assert successor.find_one({"_id": 4})["status"] == "approved"
+    assert collection.find_one({"_id": 4}) is None
+
+# -- inserts and aggregation ------------------------------------------------
+
+def test_duplicate_id_raises_duplicate_key_error():
+    collection = MockCollection("activities")
+    oid = ObjectId()
+    collection.insert_one({"_id": oid})
+    with pytest.raises(DuplicateKeyError):
+        collection.insert_one({"_id": oid})
+
+def test_aggregate_match_and_group():
+    collection = seeded()
+    collection.insert_one({"_id": 4, "status": "approved", "category": "workshop", "created_at": datetime(2025, 3, 1)})
+    result = collection.aggregate([
+        {"$match": {"status": "approved"}},
+        {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+    ])
+    assert sorted((row["_id"], row["count"]) for row in result) == [("hackathon", 1), ("workshop", 2)]
+
+@pytest.mark.parametrize("stage", [{"$sort": {"n": 1}}, {"$limit": 1}, {"$project": {"n": 1}}, {"$unwind": "$tags"}])
+def test_aggregate_rejects_unsupported_stages(stage):
+    with pytest.raises(ValueError):
+        seeded().aggregate([{"$match": {}}, stage])
+
+def test_aggregate_rejects_unsupported_accumulators():
+    with pytest.raises(ValueError):
+        seeded().aggregate([{"$group": {"_id": "$status", "top": {"$max": "$n"}}}])
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.utils.pagination import ASCENDING, decode_cursor, encode_cursor, keyset_filter
+
+KEYS = {"created_at": datetime, "_id": ObjectId}
+
+def test_round_trip():
+    values = [datetime(2025, 1, 2, 3, 4, 5), ObjectId()]
+    assert decode_cursor(encode_cursor(values), list(KEYS.values())) == values
+
+@pytest.mark.parametrize("cursor", [
+    "NQ==",                                   # 5, not a list
+    "not base64!",
+    encode_cursor([1]),                       # wrong length
+    encode_cursor([1, 2]),                    # wrong types
+    encode_cursor([{"$gt": 0}, str(ObjectId())]),
+])
+def test_malformed_keyset_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as info:
+        keyset_filter({}, KEYS, cursor, ASCENDING)
+    assert info.value.status_code == 400
+
+@pytest.mark.parametrize("values", [[True], ["3"], [1.5], []])
+def test_offset_cursor_types(values):
+    with pytest.raises(HTTPException):
+        decode_cursor(encode_cursor(values), [int])
@@ -61,6 +61,32 @@ export default function FacultyDashboard() {
     fetchDashboardData();
   }, []);
 
+  // Live queue updates pushed by the server (server-sent events)
+  useEffect(() => {
+    const token = localStorage.getItem("token");
+    if (!token) return;
+
+    const API_BASE = "http://127.0.0.1:8000";
+    const source = new EventSource(`${API_BASE}/activities/events?token=${token}`);
+
+    source.addEventListener("created", (e) => {
+      const { activity } = JSON.parse((e as MessageEvent).data);
+      setPendingActivities(prev => prev.some(a => a.id === activity.id) ? prev : [...prev, activity]);
+    });
+
+    const removeActivity = (e: Event) => {
+      const { activity } = JSON.parse((e as MessageEvent).data);
+      setPendingActivities(prev => prev.filter(a => a.id !== activity.id));
+    };
+    source.addEventListener("approved", removeActivity);
+    source.addEventListener("rejected", removeActivity);
+
+    // We fell behind and missed events: reload the queue
+    source.addEventListener("resync", () => fetchDashboardData());
+
+    return () => source.close();
+  }, []);
+
   const fetchDashboardData = async () => {
     const token = localStorage.getItem("token");
     if (!token) {
@@ -255,7 +281,7 @@ export default function FacultyDashboard() {
                         </p>
                         {activity.proof_url && (
                           <a
-                            href={`http://127.0.0.1:8000/${activity.proof_url}`}
+                            href={`http://127.0.0.1:8000/${activity.proof_url}?token=${localStorage.getItem("token")}`}
                             target="_blank"
                             rel="noopener noreferrer"
                             className="text-xs text-blue-600 hover:underline flex items-center gap-1 mt-2"